@@ -0,0 +1,100 @@
+import csv
+import json
+import re
+from itertools import islice
+
+from .serializers import VoterProfileSerializer
+
+
+# Number of rows fetched from the database cursor and serialized at once
+EXPORT_CHUNK_SIZE = 2000
+
+# The columns of the voter export, the fields of VoterProfileSerializer and the email of the user
+VOTER_FIELDS = (
+    "id",
+    "user",
+    "email",
+    "first_name",
+    "last_name",
+    "phone_number",
+    "birthdate",
+    "address",
+    "soc_url",
+    "votes_count",
+    "already_voted",
+)
+
+
+def iter_voters(queryset):
+    """
+    It yields the serialized voter profiles with the emails of their users. The profiles are read with one query
+    joined to the user and iterated in chunks, so the memory stays bounded by the chunk size
+
+    :param queryset: VoterProfile queryset, ordered
+    :return: generator of dicts with the VOTER_FIELDS keys.
+    """
+    profiles = queryset.select_related("user").iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    while True:
+        chunk = list(islice(profiles, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        for profile, row in zip(
+            chunk, VoterProfileSerializer(instance=chunk, many=True).data
+        ):
+            row["email"] = profile.user.email
+            yield {field: row[field] for field in VOTER_FIELDS}
+
+
+def stream_json(rows, next):
+    """
+    It streams {"next": next, "results": [rows]} as JSON, one row at a time
+
+    :param rows: iterable of dicts
+    :param next: The cursor of the next page or None
+    :return: generator of the JSON text parts.
+    """
+    yield f'{{"next": {json.dumps(next)}, "results": ['
+    for index, row in enumerate(rows):
+        yield ("," if index else "") + json.dumps(row, ensure_ascii=False)
+    yield "]}"
+
+
+# Spreadsheets run the cells starting with these characters as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# A signed plain number, like an E.164 phone number, is read as a number and is left as it is
+_SIGNED_NUMBER = re.compile(r"[+-]\d+(\.\d+)?")
+
+
+def _escape_cell(value):
+    if (
+        isinstance(value, str)
+        and value.startswith(FORMULA_PREFIXES)
+        and not _SIGNED_NUMBER.fullmatch(value)
+    ):
+        return "'" + value
+    return value
+
+
+class _Line:
+    """A file-like object for csv.writer which returns the written line instead of keeping it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, fields):
+    """
+    It streams the rows as CSV with a header line, one row at a time. The text cells which a spreadsheet would run as
+    a formula are prefixed with an apostrophe
+
+    :param rows: iterable of dicts
+    :param fields: The names of the columns
+    :return: generator of the CSV lines.
+    """
+    writer = csv.DictWriter(_Line(), fieldnames=fields)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(
+            {field: _escape_cell(value) for field, value in row.items()}
+        )
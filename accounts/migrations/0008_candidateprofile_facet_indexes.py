@@ -0,0 +1,31 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_alter_candidatepost_media_path_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="candidateprofile",
+            index=models.Index(
+                fields=["party", "id"], name="accounts_ca_party_3f1dd6_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="candidateprofile",
+            index=models.Index(
+                fields=["region", "id"], name="accounts_ca_region_c3c7a2_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="candidateprofile",
+            index=models.Index(
+                fields=["gender", "id"], name="accounts_ca_gender_c67fa0_idx"
+            ),
+        ),
+    ]
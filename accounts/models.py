@@ -17,6 +17,7 @@ from django.utils import timezone
 from django.utils.html import mark_safe
 from phonenumber_field.modelfields import PhoneNumberField
 from .managers import CustomUserManager
+from .session import invalidate_session_status
 
 
 def validate_url(value):
@@ -144,6 +145,12 @@ class CandidateProfile(models.Model):
     class Meta:
         verbose_name = "Թեկնածուների էջեր"
         verbose_name_plural = "Թեկնածուների էջեր"
+        # The candidate directory filters by every facet and pages by id
+        indexes = [
+            models.Index(fields=["party", "id"]),
+            models.Index(fields=["region", "id"]),
+            models.Index(fields=["gender", "id"]),
+        ]
 
 
 class VoterProfile(models.Model):
@@ -229,6 +236,7 @@ def post_save_user(sender, instance, created, **kwargs):
     else:
         user.is_voter = False
     user.save()
+    invalidate_session_status([user.pk])
 
 
 @receiver(post_save, sender=CandidateProfile)
@@ -247,6 +255,7 @@ def post_save_profile(sender, instance, created, **kwargs) -> None:
     else:
         user.is_candidate = False
     user.save()
+    invalidate_session_status([user.pk])
 
 
 @receiver(post_delete, sender=CandidateProfile)
@@ -261,6 +270,7 @@ def set_false_candidate(sender, instance, using, **kwargs):
     user = instance.user
     user.is_candidate = False
     user.save()
+    invalidate_session_status([user.pk])
 
 
 @receiver(post_delete, sender=VoterProfile)
@@ -275,6 +285,13 @@ def set_false_voter(sender, instance, using, **kwargs):
     user = instance.user
     user.is_voter = False
     user.save()
+    invalidate_session_status([user.pk])
+
+
+@receiver(post_save, sender=User)
+def post_save_session_user(sender, instance, **kwargs) -> None:
+    # The email and the admin status are a part of the cached session status
+    invalidate_session_status([instance.pk])
 
 
 @receiver(reset_password_token_created)
@@ -0,0 +1,86 @@
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+
+from .utils import bump_version, get_version
+
+
+# Seconds a session status stays cached, every change of the user or its profiles replaces it earlier
+SESSION_STATUS_TIMEOUT = 60 * 60
+
+
+def _status_key(user_id: int) -> str:
+    # The version is read before the row, so a status loaded before a change is cached under the old version
+    return f"session-status:{user_id}:{get_version(f'session:{user_id}')}"
+
+
+def get_session_status(user_id: int) -> dict:
+    """
+    It returns the status of the user and its voter and candidate profiles, loaded with one query joining both
+    profiles onto the user, and caches it
+
+    :param user_id: The id of the user
+    :type user_id: int
+    :return: dict of the SessionView response.
+    """
+    key = _status_key(user_id)
+    status = cache.get(key)
+    if status is not None:
+        return status
+
+    row = (
+        apps.get_model("accounts", "User")
+        .objects.filter(pk=user_id)
+        .values(
+            "email",
+            "is_superuser",
+            "is_voter",
+            "is_candidate",
+            "voterprofile__id",
+            "voterprofile__is_email_verified",
+            "voterprofile__is_paid",
+            "voterprofile__already_voted",
+            "candidateprofile__id",
+        )
+        .get()
+    )
+    # The fields of a missing profile are empty strings, as the frontend expects
+    status = {
+        "email": row["email"],
+        "isAuthenticated": True,
+        "voter_status": "",
+        "candidate_id": "",
+        "candidate_status": "",
+        "is_email_verified": "",
+        "is_paid": "",
+        "admin_status": row["is_superuser"],
+        "already_voted": "",
+    }
+    if row["voterprofile__id"] is not None:
+        status.update(
+            voter_status="active" if row["is_voter"] else "pending",
+            is_email_verified=row["voterprofile__is_email_verified"],
+            is_paid=row["voterprofile__is_paid"],
+            already_voted=row["voterprofile__already_voted"],
+        )
+    if row["candidateprofile__id"] is not None:
+        status.update(
+            candidate_id=row["candidateprofile__id"],
+            candidate_status="active" if row["is_candidate"] else "pending",
+        )
+    cache.set(key, status, SESSION_STATUS_TIMEOUT)
+    return status
+
+
+def invalidate_session_status(user_ids) -> None:
+    """
+    It bumps the status versions of the users after the commit of the current transaction, so a status loaded before
+    the commit is never read again, even if it is cached after the bump
+
+    :param user_ids: The ids of the users
+    """
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(
+            lambda: [bump_version(f"session:{user_id}") for user_id in user_ids]
+        )
@@ -1,11 +1,21 @@
+import hashlib
+import time
+
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import permissions
 from rest_framework.exceptions import Throttled
 from rest_framework.response import Response
 from rest_framework.views import exception_handler
 
 
+# Seconds a process may compute a value for single_flight before the others stop waiting for it
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+
+
 class CandidatePermission(permissions.BasePermission):
     """class which check candidate permission"""
 
@@ -80,3 +90,88 @@ def send_mailgun_mail(
         data={"from": form, "to": to, "subject": subject, "text": message},
     )
     return result
+
+
+def get_version(name: str) -> int:
+    """
+    It returns the current version stamp of the named data. Every process compares it with the version of its own copy
+    to find out if the copy is stale, so the stamp lives in the shared cache
+
+    :param name: The name of the versioned data
+    :type name: str
+    :return: The version stamp.
+    """
+    return cache.get_or_set(f"version:{name}", time.time_ns, timeout=None)
+
+
+def bump_version(name: str) -> int:
+    """
+    It bumps the version stamp of the named data, which invalidates every copy of it
+
+    :param name: The name of the versioned data
+    :type name: str
+    :return: The new version stamp.
+    """
+    key = f"version:{name}"
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The stamp was evicted, starting from the current time so it can not go back to an already seen value
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.incr(key)
+
+
+def conditional_get(*versions: str, key=None):
+    """
+    It decorates the get method of an APIView to answer 304 Not Modified when the ETag sent in If-None-Match is still
+    current, before the view runs. The ETag is made of the version stamps of the data the response depends on, the
+    path with the query string and the Accept header
+
+    :param versions: The names of the version stamps bumped by the post_save receivers of the data
+    :param key: function of the request which returns the state that has no version stamp
+    :return: The method decorator.
+    """
+
+    def etag_func(request, *args, **kwargs):
+        parts = [str(get_version(name)) for name in versions]
+        if key is not None:
+            parts.append(str(key(request)))
+        parts += [request.get_full_path(), request.META.get("HTTP_ACCEPT", "")]
+        return hashlib.md5("|".join(parts).encode()).hexdigest()
+
+    return method_decorator(condition(etag_func=etag_func))
+
+
+def single_flight(key: str, compute, timeout: int, wait: float = 0.05):
+    """
+    It returns the cached value of the key, computing it if it is missing. Only one process computes a missing value,
+    the others wait for it up to SINGLE_FLIGHT_LOCK_TIMEOUT seconds instead of all hitting the database at once
+
+    :param key: The cache key
+    :type key: str
+    :param compute: function without arguments which returns the value, it must not return None
+    :param timeout: Seconds the computed value stays cached
+    :type timeout: int
+    :param wait: Seconds between the checks of a waiting process
+    :type wait: float
+    :return: The value.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    lock = f"{key}:lock"
+    if cache.add(lock, 1, timeout=SINGLE_FLIGHT_LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock)
+        return value
+    deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(wait)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    # The computing process failed or is too slow
+    return compute()
@@ -5,6 +5,7 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.tokens import default_token_generator
+from django.http import StreamingHttpResponse
 from django.core.mail import send_mail
 from django.middleware.csrf import get_token
 from django.shortcuts import redirect
@@ -21,7 +22,9 @@ from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from .models import CandidatePost, CandidateProfile, User, VoterProfile
+from .export import VOTER_FIELDS, iter_voters, stream_csv, stream_json
 from .serializers import *
+from .session import get_session_status
 from .utils import CandidatePermission, send_mailgun_mail
 from primaries_app.models import GlobalConfigs
 from rest_framework import generics
@@ -155,7 +158,8 @@ class SessionView(APIView):
 
     def get(self, request, format=None):
         """
-        It checks if the user is a voter or candidate, and returns the status of the user
+        It checks if the user is a voter or candidate, and returns the status of the user. The status is loaded with
+        one query and cached until the user or its profiles change
 
         :param request: The request object
         :param format: The format of the response
@@ -168,51 +172,7 @@ class SessionView(APIView):
         is_email_verified: is email verified or not,
         is_paid: is user pay for voting or not.
         """
-        # Checking if the user is a voter. If the user is a voter, it sets the voter_status to active. If the user is not
-        # a voter, it sets the voter_status to pending.
-        try:
-            voter_profile = VoterProfile.objects.get(user=request.user)
-
-        except VoterProfile.DoesNotExist:
-            voter_status = ""
-            is_email_verified = ""
-            is_paid = ""
-            already_voted = ""
-        else:
-            is_email_verified = voter_profile.is_email_verified
-            is_paid = voter_profile.is_paid
-            already_voted = voter_profile.already_voted
-            if voter_profile.user.is_voter:
-                voter_status = "active"
-            else:
-                voter_status = "pending"
-        # Checking if the user is a candidate. If the user is a candidate, it will return "active" and if the user is not
-        # a candidate, it will return "pending".
-        try:
-            candidate_profile = CandidateProfile.objects.get(user=request.user)
-        except CandidateProfile.DoesNotExist:
-            candidate_status = ""
-            candidate_id = ""
-        else:
-            candidate_id = candidate_profile.id
-            if candidate_profile.user.is_candidate:
-                candidate_status = "active"
-            else:
-                candidate_status = "pending"
-
-        return Response(
-            {
-                "email": request.user.email,
-                "isAuthenticated": True,
-                "voter_status": voter_status,
-                "candidate_id": candidate_id,
-                "candidate_status": candidate_status,
-                "is_email_verified": is_email_verified,
-                "is_paid": is_paid,
-                "admin_status": request.user.is_superuser,
-                "already_voted": already_voted,
-            }
-        )
+        return Response(get_session_status(request.user.pk))
 
 
 @method_decorator(csrf_protect, "post")
@@ -234,7 +194,7 @@ class UserApiView(APIView):
         :param request: The incoming request
         :return: The serializer.data is being returned.
         """
-        if GlobalConfigs.objects.get(id=1).stage not in ("1", "2", "4"):
+        if GlobalConfigs.load().stage not in ("1", "2", "4"):
             return Response(
                 "Այս փուլում գրանցումը անհասանելի Է", status=status.HTTP_423_LOCKED
             )
@@ -772,17 +732,51 @@ class GetVoterProfiles(APIView):
     """ This class is a subclass of the APIView class, and it has a get method that returns\
              a list of all the voter profiles in the database """
 
+    permission_classes = (permissions.IsAdminUser,)
+
     def get(self, request, *args, **kwargs):
-        """A function that gets the request, args, and kwargs.
+        """
+        It streams the active voter profiles with the emails of their users ordered by id, as JSON or as CSV if the
+        "output" query param is "csv". The page starts after the "after" id and has at most "limit" profiles, all the
+        remaining profiles if there is no limit
 
         :param request: The request object
+        :return: StreamingHttpResponse, the cursor of the next page is in the JSON and in the X-Next header.
         """
-
-        voters = VoterProfile.objects.all().filter(user__is_voter=True)
-        serializer = VoterProfileSerializer(instance=voters, many=True)
-        for i in serializer.data:
-            i['email'] = VoterProfile.objects.get(id=i['id']).user.email
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        output = request.query_params.get("output", "json")
+        try:
+            after = int(request.query_params.get("after", 0))
+            limit = request.query_params.get("limit")
+            limit = None if limit is None else int(limit)
+        except ValueError:
+            return Response("Սխալ պարամետրեր", status=status.HTTP_400_BAD_REQUEST)
+        if output not in ("json", "csv") or (limit is not None and limit < 1):
+            return Response("Սխալ պարամետրեր", status=status.HTTP_400_BAD_REQUEST)
+
+        voters = VoterProfile.objects.filter(
+            user__is_voter=True, id__gt=after
+        ).order_by("id")
+        next = None
+        if limit is not None:
+            # The last profile of the page is the cursor only if some profile follows it, found before the streaming
+            # starts
+            ids = list(voters.values_list("id", flat=True)[limit - 1 : limit + 1])
+            if len(ids) == 2:
+                next = ids[0]
+            voters = voters[:limit]
+        rows = iter_voters(voters)
+        if output == "csv":
+            response = StreamingHttpResponse(
+                stream_csv(rows, VOTER_FIELDS), content_type="text/csv; charset=utf-8"
+            )
+            response["Content-Disposition"] = 'attachment; filename="voters.csv"'
+        else:
+            response = StreamingHttpResponse(
+                stream_json(rows, next), content_type="application/json"
+            )
+        if next is not None:
+            response["X-Next"] = next
+        return response
 
 
 class ChangePasswordView(generics.UpdateAPIView):
@@ -13,6 +13,7 @@ import os
 from pathlib import Path
 
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 project_folder = os.path.expanduser("~/primaries")
@@ -147,6 +148,36 @@ db_from_env = dj_database_url.config(
 )
 DATABASES["default"].update(db_from_env)
 
+# Cache
+# Version stamps and cached responses must be shared by all gunicorn workers, so in production
+# the cache must be Redis, the local memory cache of every process is fine only for development.
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+elif not DEBUG:
+    raise ImproperlyConfigured(
+        "REDIS_URL is required in the deployment mode, the workers would never see each other's changes"
+    )
+
+# Seconds GlobalConfigs.load trusts the configs cached in the process before reading them again
+GLOBAL_CONFIGS_TTL = float(os.environ.get("GLOBAL_CONFIGS_TTL", 5))
+
+# Seconds a stage transition may wait for the run_stage_transitions worker before the admin is warned
+STAGE_TRANSITION_WARN_AFTER = float(os.environ.get("STAGE_TRANSITION_WARN_AFTER", 60))
+
+# Ballot journal
+# When BALLOT_JOURNAL is True VoteView only appends the validated ballots to a local SQLite journal,
+# and the "manage.py drain_ballots" worker stores them into the database in batches.
+BALLOT_JOURNAL = str(os.environ.get("BALLOT_JOURNAL")) == "True"
+BALLOT_JOURNAL_PATH = os.environ.get(
+    "BALLOT_JOURNAL_PATH", os.path.join(BASE_DIR, "ballot_journal.sqlite3")
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -1,25 +1,104 @@
 from django import forms
-from django.contrib import admin
-from django.utils.html import strip_tags
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from django.utils.html import format_html, format_html_join, strip_tags
+
+from accounts.models import CandidateProfile
 
 from .models import (
+    Ballot,
+    CandidateScore,
     EvaluateModel,
     GlobalConfigs,
     MarkModel,
     News,
-    VotingModel,
     PayViaImage,
+    ResultSnapshot,
+    StageTally,
+    StageTransition,
+    reset_stages,
 )
 
 
+def warn_stage_transition(request) -> None:
+    """
+    It warns the admin about the active stage transition which is not picked by the worker or whose last run failed,
+    and about the closed voting stage whose results are not frozen yet
+
+    :param request: The request object
+    """
+    finished = StageTransition.objects.last_finished()
+    if finished is not None and finished.needs_snapshot:
+        messages.warning(
+            request,
+            "Քվեարկության արդյունքները դեռ սառեցված չեն, բոլոր սերվերների քվեաթերթիկների ժուռնալները դատարկվելուց "
+            f"հետո գործարկեք «manage.py snapshot_results {finished.finished_stage}»",
+        )
+    transition = StageTransition.objects.active()
+    if transition is None:
+        return
+    if transition.is_stalled:
+        messages.warning(
+            request,
+            "Փուլի փոփոխությունը դեռ չի սկսվել, ստուգեք, որ run_stage_transitions worker-ը աշխատում է",
+        )
+    if transition.error:
+        messages.error(request, f"Փուլի փոփոխության սխալ: {transition.error}")
+
+
 @admin.register(GlobalConfigs)
 class ConfigAdmin(admin.ModelAdmin):
+    readonly_fields = ("transition",)
+
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        if request.method == "GET":
+            warn_stage_transition(request)
+        return super().change_view(request, object_id, form_url, extra_context)
+
     def has_add_permission(self, request):
         return False
 
     def has_delete_permission(self, request, obj=None):
         return False
 
+    @admin.display(description="Փուլի փոփոխություն")
+    def transition(self, obj):
+        transition = StageTransition.objects.active()
+        if transition is None:
+            return "-"
+        return f"{transition.get_stage_display()}: {transition.progress}"
+
+    def save_model(self, request, obj, form, change):
+        """
+        Moving to a stage which resets the voters only starts a StageTransition, the stage is changed by the
+        run_stage_transitions worker when all voters are reset
+        """
+        if StageTransition.objects.active() is not None:
+            self.message_user(
+                request, "Փուլի փոփոխությունը արդեն ընթացքում է", messages.ERROR
+            )
+            request._stage_not_saved = True
+            return
+        previous = (
+            GlobalConfigs.objects.filter(pk=1).values_list("stage", flat=True).first()
+        )
+        if obj.stage != previous and obj.stage in reset_stages:
+            StageTransition.objects.start(obj.stage)
+            self.message_user(
+                request,
+                "Ընտրողների տվյալները զրոյացվում են, փուլը կփոխվի զրոյացման ավարտից հետո",
+                messages.WARNING,
+            )
+            request._stage_not_saved = True
+            return
+        super().save_model(request, obj, form, change)
+
+    def response_change(self, request, obj):
+        # Skipping the "changed successfully" message when the stage was not saved
+        if getattr(request, "_stage_not_saved", False):
+            return HttpResponseRedirect(request.path)
+        return super().response_change(request, obj)
+
 
 @admin.register(MarkModel)
 class MarkAdmin(admin.ModelAdmin):
@@ -66,11 +145,109 @@ class NewsAdmin(admin.ModelAdmin):
     search_fields = ("title",)
 
 
-@admin.register(VotingModel)
-class VotingAdmin(admin.ModelAdmin):
-    list_display = ("voter", "candidate", "position", "stage", "points")
-    list_filter = ("voter", "candidate", "position", "stage", "points")
-    ordering = ("voter", "position")
+@admin.register(Ballot)
+class BallotAdmin(admin.ModelAdmin):
+    list_display = ("voter", "stage", "votes_count")
+    list_filter = ("stage",)
+    search_fields = ("voter__first_name", "voter__last_name")
+    ordering = ("stage", "voter")
+    exclude = ("candidates",)
+    readonly_fields = ("voter", "stage", "votes_count", "positions")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Քվեարկության արդյունքներ")
+    def positions(self, obj):
+        """It shows the ballot as the former per position rows: position, candidate and points"""
+        names = {
+            candidate.pk: candidate
+            for candidate in CandidateProfile.objects.filter(pk__in=obj.candidate_ids)
+        }
+        return format_html(
+            "<table><tr><th>Համարը</th><th>Թեկնածու</th><th>Միաորների Քանակը</th></tr>{}</table>",
+            format_html_join(
+                "",
+                "<tr><td>{}</td><td>{}</td><td>{}</td></tr>",
+                (
+                    (
+                        vote.position,
+                        names.get(vote.candidate_id, vote.candidate_id),
+                        round(vote.points, 4),
+                    )
+                    for vote in obj.votes()
+                ),
+            ),
+        )
+
+
+@admin.register(StageTally)
+class StageTallyAdmin(admin.ModelAdmin):
+    list_display = ("candidate", "stage", "points", "ballots")
+    list_filter = ("stage",)
+    ordering = ("stage", "-points")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CandidateScore)
+class CandidateScoreAdmin(admin.ModelAdmin):
+    list_display = ("candidate", "mark", "count")
+    list_filter = ("mark",)
+    ordering = ("candidate", "mark")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResultSnapshot)
+class ResultSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("stage", "created_at", "etag")
+    list_filter = ("stage",)
+    readonly_fields = ("stage", "totals", "positions", "etag", "created_at")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StageTransition)
+class StageTransitionAdmin(admin.ModelAdmin):
+    list_display = ("stage", "status", "progress", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = (
+        "stage",
+        "status",
+        "progress",
+        "cursor",
+        "total",
+        "done",
+        "error",
+        "created_at",
+        "finished_at",
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        warn_stage_transition(request)
+        return super().changelist_view(request, extra_context)
 
 
 @admin.register(PayViaImage)
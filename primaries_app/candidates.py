@@ -0,0 +1,129 @@
+import hashlib
+from collections import Counter
+
+from django.apps import apps
+from django.core.cache import cache
+
+from accounts.models import CandidatePost, CandidateProfile, gender, region
+from accounts.serializers import CandidatePostSerializer, CandidateProfileSerializer
+from accounts.utils import bump_version, get_version, single_flight
+
+from .roster import get_candidate, get_roster
+
+
+# Seconds a candidate page stays cached, every change of the profile or its posts replaces it earlier
+DETAIL_TIMEOUT = 60 * 60
+
+# The fields the candidate directory is filtered by, with the allowed values or None if any value is allowed
+FACETS = {
+    "party": None,
+    "region": [value for value, _ in region],
+    "gender": [value for value, _ in gender],
+}
+
+# Seconds a facet summary stays cached, every change of the roster replaces it earlier
+FACETS_TIMEOUT = 60 * 60
+
+
+def get_candidate_detail(candidate_id: int) -> dict | None:
+    """
+    It returns the serialized profile and posts of the candidate, loaded with one prefetching query and cached.
+    Only one process loads an expired page. A missing id is answered from the roster without touching the cache, so
+    requests for made up ids neither create version stamps nor cache empty pages
+
+    :param candidate_id: The id of the candidate profile
+    :type candidate_id: int
+    :return: {"profile": ..., "posts": [...]} or None if the profile does not exist.
+    """
+
+    def load():
+        candidate = (
+            CandidateProfile.objects.filter(pk=candidate_id)
+            .prefetch_related("candidatepost_set")
+            .first()
+        )
+        if candidate is None:
+            # Deleted after the roster was read
+            return {}
+        posts = candidate.candidatepost_set.all()
+        # The rich text is shipped as the sanitized HTML rendered on save
+        renditions = apps.get_model("primaries_app", "RichTextRendition").objects
+        posts_html = renditions.of(CandidatePost, [post.pk for post in posts], "html")
+        return {
+            "profile": {
+                **CandidateProfileSerializer(instance=candidate).data,
+                **renditions.of(CandidateProfile, [candidate.pk], "html")[candidate.pk],
+            },
+            "posts": [
+                {**post, **posts_html[post["id"]]}
+                for post in CandidatePostSerializer(instance=posts, many=True).data
+            ],
+        }
+
+    if get_candidate(candidate_id) is None:
+        return None
+    key = f"candidate-detail:{candidate_id}:{get_version(f'candidate:{candidate_id}')}"
+    return single_flight(key, load, DETAIL_TIMEOUT) or None
+
+
+def invalidate_candidate(candidate_id: int) -> None:
+    """It replaces the cached page of the candidate in every process"""
+    bump_version(f"candidate:{candidate_id}")
+
+
+def parse_filters(params) -> dict:
+    """
+    It picks the facet filters from the query params
+
+    :param params: The query params of the request
+    :return: dict where key is the facet and value is the requested value
+    :raises ValueError: if the region or the gender is not one of the choices
+    """
+    filters = {}
+    for facet, choices in FACETS.items():
+        value = params.get(facet)
+        if value is None or value == "":
+            continue
+        if choices is not None and value not in choices:
+            raise ValueError(facet)
+        filters[facet] = value
+    return filters
+
+
+def get_facets(filters: dict) -> dict:
+    """
+    It counts the confirmed candidates for every value of every facet. The counts of a facet are taken with the
+    filters of the other facets, so the other values of the filtered facet keep their counts. It is computed from the
+    roster without a query and cached until the next roster change
+
+    :param filters: dict returned by parse_filters
+    :type filters: dict
+    :return: dict with the "total" number of the matching candidates and the counts of the values of every facet
+    """
+    digest = hashlib.md5(repr(sorted(filters.items())).encode()).hexdigest()
+    key = f"candidate-facets:{get_version('roster')}:{digest}"
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    entries = [entry for entry in get_roster().values() if entry.is_candidate]
+    result = {
+        "total": sum(
+            all(getattr(entry, facet) == value for facet, value in filters.items())
+            for entry in entries
+        )
+    }
+    for facet, choices in FACETS.items():
+        counts = Counter(
+            getattr(entry, facet)
+            for entry in entries
+            if all(
+                getattr(entry, other) == value
+                for other, value in filters.items()
+                if other != facet
+            )
+        )
+        # Every choice is listed, the ones without candidates with 0
+        result[facet] = {value: counts[value] for value in choices or sorted(counts)}
+    cache.set(key, result, FACETS_TIMEOUT)
+    return result
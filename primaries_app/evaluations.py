@@ -0,0 +1,142 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from accounts.utils import bump_version, get_version
+
+from .roster import get_roster
+
+
+# Seconds the evaluation states and the score distribution stay cached, evaluation writes replace them earlier
+STATE_TIMEOUT = 60 * 60
+
+
+def _state_key(voter_id: int) -> str:
+    # The version of the voter changes with its evaluations and the version of the marks when the value of some
+    # MarkModel changes. Both are read before the evaluations, so a state loaded before a change is cached under the
+    # old versions
+    versions = (get_version(f"evaluations:{voter_id}"), get_version("marks"))
+    return f"evaluate-state:{voter_id}:{':'.join(map(str, versions))}"
+
+
+def get_evaluation_state(voter_id: int) -> dict:
+    """
+    It returns every evaluation of the voter with one query joined to MarkModel, and caches it
+
+    :param voter_id: The id of the VoterProfile of the voter
+    :type voter_id: int
+    :return: dict where key is the candidate id and value is {"poll": poll id, "mark": mark}
+    """
+    key = _state_key(voter_id)
+    state = cache.get(key)
+    if state is None:
+        state = {
+            str(candidate): {"poll": poll, "mark": mark}
+            for candidate, poll, mark in apps.get_model(
+                "primaries_app", "EvaluateModel"
+            )
+            .objects.filter(voter_id=voter_id)
+            .values_list("candidate", "poll", "poll__mark")
+        }
+        cache.set(key, state, STATE_TIMEOUT)
+    return state
+
+
+def _distribution_key() -> str:
+    versions = [get_version(name) for name in ("evaluations", "marks", "roster")]
+    return f"evaluate-distribution:{':'.join(map(str, versions))}"
+
+
+def get_score_distribution() -> dict:
+    """
+    It computes for every eligible candidate the number of evaluations with every MarkModel, the total points, the
+    mean and the variance of the marks, and the rank and the percentile of the points among all candidates. It is
+    computed with one grouped query and cached until the next evaluation or MarkModel change
+
+    :return: dict with the "levels" list of the MarkModels and the "candidates" list ordered by candidate id
+    """
+    key = _distribution_key()
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    counts = defaultdict(dict)
+    levels = {}
+    for candidate, poll, mark, count in (
+        apps.get_model("primaries_app", "EvaluateModel")
+        .objects.values_list("candidate", "poll", "poll__mark")
+        .order_by()
+        .annotate(count=Count("id"))
+    ):
+        counts[candidate][poll] = count
+        levels[poll] = mark
+    for poll, mark in (
+        apps.get_model("primaries_app", "MarkModel")
+        .objects.exclude(pk__in=levels)
+        .values_list("pk", "mark")
+    ):
+        levels[poll] = mark
+
+    candidates = []
+    for candidate, entry in sorted(get_roster().items()):
+        if not entry.is_candidate:
+            continue
+        evaluations = sum(counts[candidate].values())
+        points = sum(levels[poll] * n for poll, n in counts[candidate].items())
+        mean = points / evaluations if evaluations else None
+        variance = (
+            sum(n * (levels[poll] - mean) ** 2 for poll, n in counts[candidate].items())
+            / evaluations
+            if evaluations
+            else None
+        )
+        candidates.append(
+            {
+                "candidate": candidate,
+                "counts": {str(poll): n for poll, n in counts[candidate].items()},
+                "evaluations": evaluations,
+                "points": points,
+                "mean": mean,
+                "variance": variance,
+            }
+        )
+
+    all_points = sorted(candidate["points"] for candidate in candidates)
+    for candidate in candidates:
+        lower = bisect_left(all_points, candidate["points"])
+        higher = len(all_points) - bisect_right(all_points, candidate["points"])
+        candidate["rank"] = higher + 1
+        candidate["percentile"] = lower / len(all_points) * 100
+
+    result = {
+        "levels": [
+            {"poll": poll, "mark": mark}
+            for poll, mark in sorted(levels.items(), key=lambda level: level[1])
+        ],
+        "candidates": candidates,
+    }
+    cache.set(key, result, STATE_TIMEOUT)
+    return result
+
+
+def invalidate_evaluations(voter_id: int) -> None:
+    """
+    After the current transaction is committed it bumps the version of the evaluations of the voter, which invalidates
+    its evaluation state, and the version of all evaluations, which invalidates the score distribution and the
+    evaluation results
+    """
+
+    def invalidate():
+        bump_version(f"evaluations:{voter_id}")
+        bump_version("evaluations")
+
+    transaction.on_commit(invalidate)
+
+
+def invalidate_marks() -> None:
+    """It marks the cached evaluation states of all voters, the score distribution and the MarkModel list as stale"""
+    bump_version("marks")
@@ -0,0 +1,137 @@
+import json
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+
+PENDING = "pending"
+COMMITTED = "committed"
+REJECTED = "rejected"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ballots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    voter_id INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    votes TEXT NOT NULL,
+    votes_count INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    received_at REAL NOT NULL,
+    committed_at REAL,
+    UNIQUE (voter_id, stage)
+);
+CREATE INDEX IF NOT EXISTS ballots_status ON ballots (status, id);
+"""
+
+_local = threading.local()
+
+
+def _connection() -> sqlite3.Connection:
+    """
+    It returns the journal connection of the current thread, creating the journal file if it does not exist
+
+    :return: sqlite3 connection in autocommit mode.
+    """
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = sqlite3.connect(
+            settings.BALLOT_JOURNAL_PATH, timeout=30, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        # Every appended ballot is on the disk before VoteView answers
+        connection.execute("PRAGMA synchronous=FULL")
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+    return connection
+
+
+def append(voter_id: int, stage, votes: list, votes_count: int) -> bool:
+    """
+    It appends a validated ballot to the journal
+
+    :param voter_id: The id of the VoterProfile of the voter
+    :param stage: The stage of the election
+    :param votes: list of candidate ids ordered by position
+    :param votes_count: The votes count of the voter at the moment of voting
+    :return: False if the voter already has a ballot of the stage in the journal, otherwise True.
+    """
+    try:
+        _connection().execute(
+            "INSERT INTO ballots (voter_id, stage, votes, votes_count, received_at) VALUES (?, ?, ?, ?, ?)",
+            (voter_id, int(stage), json.dumps(votes), votes_count, time.time()),
+        )
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+def get_status(voter_id: int, stage) -> tuple | None:
+    """
+    It returns the status of the voter's ballot of the stage
+
+    :param voter_id: The id of the VoterProfile of the voter
+    :param stage: The stage of the election
+    :return: (status, error) or None if the journal has no such ballot.
+    """
+    return (
+        _connection()
+        .execute(
+            "SELECT status, error FROM ballots WHERE voter_id = ? AND stage = ?",
+            (voter_id, int(stage)),
+        )
+        .fetchone()
+    )
+
+
+def pending(limit: int) -> list:
+    """
+    It returns the oldest ballots which are not stored yet
+
+    :param limit: The maximum number of ballots
+    :return: list of (journal id, voter id, candidate ids, stage, votes count) tuples.
+    """
+    rows = _connection().execute(
+        "SELECT id, voter_id, votes, stage, votes_count FROM ballots WHERE status = ? ORDER BY id LIMIT ?",
+        (PENDING, limit),
+    )
+    return [
+        (id, voter_id, json.loads(votes), stage, votes_count)
+        for id, voter_id, votes, stage, votes_count in rows
+    ]
+
+
+def count_pending(stage) -> int:
+    """
+    It counts the ballots of the stage which are not stored yet
+
+    :param stage: The stage of the election
+    :return: The number of the pending ballots.
+    """
+    return (
+        _connection()
+        .execute(
+            "SELECT COUNT(*) FROM ballots WHERE status = ? AND stage = ?",
+            (PENDING, int(stage)),
+        )
+        .fetchone()[0]
+    )
+
+
+def mark(ids: list, status: str, error: str | None = None) -> None:
+    """
+    It sets the status of the given journal entries
+
+    :param ids: list of journal ids
+    :param status: COMMITTED or REJECTED
+    :param error: The reason of the rejection
+    """
+    connection = _connection()
+    connection.execute("BEGIN IMMEDIATE")
+    connection.executemany(
+        "UPDATE ballots SET status = ?, error = ?, committed_at = ? WHERE id = ?",
+        [(status, error, time.time(), id) for id in ids],
+    )
+    connection.execute("COMMIT")
@@ -0,0 +1,270 @@
+import datetime
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+import numpy as np
+
+from accounts.models import CandidateProfile, User, VoterProfile
+from primaries_app.models import GlobalConfigs, MarkModel, ResultSnapshot
+from primaries_app.roster import invalidate_roster
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the vote pipeline on a throwaway test database of the configured backend (SQLite or Postgres): "
+        "seeds candidates and paid voters, replays concurrent ballots, evaluations and result reads, and reports "
+        "latency percentiles, queries per request and throughput of every endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--candidates", type=int, default=30)
+        parser.add_argument("--voters", type=int, default=200)
+        parser.add_argument(
+            "--ballot", type=int, default=15, help="Candidates ranked on a ballot"
+        )
+        parser.add_argument(
+            "--evaluations", type=int, default=5, help="Evaluations posted per voter"
+        )
+        parser.add_argument(
+            "--reads", type=int, default=500, help="Requests of every results endpoint"
+        )
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent clients")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        if connection.vendor == "sqlite":
+            # A file database, the in-memory one does not allow concurrent writers
+            connection.settings_dict["TEST"]["NAME"] = "benchmark.sqlite3"
+            connection.settings_dict.setdefault("OPTIONS", {})["timeout"] = 30
+        cache_settings = {
+            alias: {**config, "KEY_PREFIX": "benchmark"}
+            for alias, config in settings.CACHES.items()
+        }
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=cache_settings):
+                self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, options):
+        candidates, voters = self.seed(options["candidates"], options["voters"])
+        males = [c.pk for c in candidates if c.gender == "male"]
+        females = [c.pk for c in candidates if c.gender == "female"]
+        polls = list(MarkModel.objects.values_list("pk", flat=True))
+        length = min(options["ballot"], len(candidates))
+        # SQLite has a single writer and fails a transaction upgrading to a write lock instead of waiting for it, so
+        # the writing phases are replayed by one client there
+        writers = 1 if connection.vendor == "sqlite" else options["workers"]
+
+        def ballot():
+            half = length // 2
+            votes = random.sample(males, length - half) + random.sample(females, half)
+            random.shuffle(votes)
+            return {"votes": votes}
+
+        self.set_stage("2")
+        self.replay(
+            "evaluate",
+            [
+                (
+                    voter,
+                    "post",
+                    "/evaluate/",
+                    {"candidate": candidate.pk, "poll": random.choice(polls)},
+                )
+                for voter in voters
+                # A voter evaluates every candidate only once
+                for candidate in random.sample(
+                    candidates, min(options["evaluations"], len(candidates))
+                )
+            ],
+            writers,
+        )
+        self.replay(
+            "evaluate_result",
+            [(None, "get", "/evaluate_result/", None)] * options["reads"],
+            options["workers"],
+        )
+
+        self.set_stage("3")
+        self.replay(
+            "vote",
+            [(voter, "post", "/vote/", ballot()) for voter in voters],
+            writers,
+        )
+
+        self.set_stage("4")
+        for name, path in (
+            ("vote_result", "/vote-result/"),
+            ("vote_result_breakdown", "/vote-result/breakdown/"),
+        ):
+            self.replay(
+                name,
+                [(None, "get", path, None)] * options["reads"],
+                options["workers"],
+            )
+
+    def seed(self, candidate_count: int, voter_count: int) -> tuple:
+        """
+        It creates approved candidates, paid voters and evaluation marks with bulk inserts
+
+        :return: The lists of the created CandidateProfile and VoterProfile objects.
+        """
+        password = make_password("benchmark")
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=f"candidate{i}@benchmark.am",
+                    password=password,
+                    is_candidate=True,
+                )
+                for i in range(candidate_count)
+            ]
+            + [
+                User(email=f"voter{i}@benchmark.am", password=password, is_voter=True)
+                for i in range(voter_count)
+            ]
+        )
+        if not connection.features.can_return_rows_from_bulk_insert:
+            users = list(User.objects.order_by("pk"))
+        candidates = CandidateProfile.objects.bulk_create(
+            [
+                CandidateProfile(
+                    user=user,
+                    first_name=f"Թեկնածու {i}",
+                    last_name="Թեստային",
+                    birthdate=datetime.date(1980, 1, 1),
+                    picture="profile_pictures/benchmark.jpg",
+                    gender=("male", "female")[i % 2],
+                    phone_number="+37491000000",
+                    region="Կենտրոն",
+                    address="Երևան",
+                    facebook_url="https://facebook.com/benchmark",
+                    education="<p>Կրթություն</p>",
+                    work_experience="<p>Աշխատանք</p>",
+                    political_experience="<p>Քաղաքական</p>",
+                    marital_status="<p>Ընտանիք</p>",
+                    political_opinion="<p>Դիրքորոշում</p>",
+                    yerevan_rebuild="<p>Բարեփոխումներ</p>",
+                    is_email_verified=True,
+                    is_approved=True,
+                )
+                for i, user in enumerate(users[:candidate_count])
+            ]
+        )
+        voters = VoterProfile.objects.bulk_create(
+            [
+                VoterProfile(
+                    user=user,
+                    first_name=f"Ընտրող {i}",
+                    last_name="Թեստային",
+                    phone_number="+37491000000",
+                    address="Երևան",
+                    soc_url="https://facebook.com/benchmark",
+                    is_email_verified=True,
+                    is_paid=True,
+                    votes_count=random.randint(1, 5),
+                )
+                for i, user in enumerate(users[candidate_count:])
+            ]
+        )
+        if not connection.features.can_return_rows_from_bulk_insert:
+            candidates = list(CandidateProfile.objects.order_by("pk"))
+            voters = list(VoterProfile.objects.select_related("user").order_by("pk"))
+        MarkModel.objects.bulk_create(
+            [
+                MarkModel(content=f"Գնահատական {mark}", mark=mark)
+                for mark in range(-2, 6)
+            ]
+        )
+        invalidate_roster()
+        return candidates, voters
+
+    def set_stage(self, stage: str) -> None:
+        # The benchmark is the only process, so dropping the copy of this process is enough
+        GlobalConfigs.objects.filter(pk=1).update(stage=stage)
+        GlobalConfigs.invalidate()
+        if stage == "4":
+            # The snapshot snapshot_results takes when the voting is closed
+            ResultSnapshot.objects.take(3)
+
+    def replay(self, name: str, requests: list, workers: int) -> None:
+        """
+        It sends the requests from concurrent clients and reports the statistics of the endpoint
+
+        :param name: The name of the endpoint in the report
+        :param requests: list of (voter profile or None, method, path, data) tuples
+        :param workers: The number of concurrent clients
+        """
+        tasks = queue.Queue()
+        clients = {}
+        for voter, method, path, data in requests:
+            if voter is not None and voter.pk not in clients:
+                clients[voter.pk] = Client()
+                clients[voter.pk].force_login(voter.user)
+            tasks.put((clients.get(getattr(voter, "pk", None)), method, path, data))
+        results = defaultdict(list)
+
+        def work():
+            anonymous = Client()
+            try:
+                while True:
+                    try:
+                        client, method, path, data = tasks.get_nowait()
+                    except queue.Empty:
+                        return
+                    with CaptureQueriesContext(connections["default"]) as queries:
+                        start = time.perf_counter()
+                        try:
+                            response = getattr(client or anonymous, method)(
+                                path, data, content_type="application/json"
+                            )
+                            failed = response.status_code >= 400
+                        except Exception:
+                            failed = True
+                        elapsed = time.perf_counter() - start
+                    results["latency"].append(elapsed)
+                    results["queries"].append(len(queries))
+                    results["errors"].append(failed)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        if not results["latency"]:
+            self.stdout.write(f"{name:<22} requests=0")
+            return
+        latency = np.array(results["latency"]) * 1000
+        p50, p95, p99 = np.percentile(latency, (50, 95, 99))
+        self.stdout.write(
+            f"{name:<22} requests={len(latency):<6} errors={sum(results['errors']):<5} "
+            f"p50={p50:7.1f}ms p95={p95:7.1f}ms p99={p99:7.1f}ms "
+            f"queries={np.mean(results['queries']):5.1f} throughput={len(latency) / wall:7.1f}/s"
+        )
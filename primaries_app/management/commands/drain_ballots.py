@@ -0,0 +1,97 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+
+from accounts.models import CandidateProfile, VoterProfile
+from primaries_app import journal
+from primaries_app.models import Ballot
+
+
+class Command(BaseCommand):
+    help = "Stores the ballots of the ballot journal into the Ballot table in large batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch", type=int, default=500, help="Ballots stored per transaction"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the journal is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the journal is drained instead of waiting for new ballots",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            entries = journal.pending(options["batch"])
+            if not entries:
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
+                continue
+            self.drain(entries)
+
+    def drain(self, entries: list) -> None:
+        """
+        It stores a batch of journal entries and marks them as committed. Entries of deleted voters or with deleted
+        candidates are rejected, and if the batch still fails, the entries are stored one by one and only the failing
+        ones are rejected, so one bad entry does not block the journal
+
+        :param entries: list of journal entries
+        """
+        existing = set(
+            VoterProfile.objects.filter(
+                pk__in={voter_id for _, voter_id, _, _, _ in entries}
+            ).values_list("pk", flat=True)
+        )
+        candidates = set(
+            CandidateProfile.objects.filter(
+                pk__in={id for _, _, votes, _, _ in entries for id in votes}
+            ).values_list("pk", flat=True)
+        )
+        rejected = [id for id, voter_id, _, _, _ in entries if voter_id not in existing]
+        if rejected:
+            journal.mark(rejected, journal.REJECTED, "Ընտրողի էջը գոյություն չունի")
+        deleted = [
+            id
+            for id, voter_id, votes, _, _ in entries
+            if voter_id in existing and not candidates.issuperset(votes)
+        ]
+        if deleted:
+            journal.mark(deleted, journal.REJECTED, "Թեկնածուի էջը գոյություն չունի")
+
+        ballots = [
+            entry
+            for entry in entries
+            if entry[1] in existing and candidates.issuperset(entry[2])
+        ]
+        # Ballots skipped by cast_ballots already have a stored ballot of the stage, which happens when the worker
+        # stopped after the database commit and before marking the journal
+        failed = []
+        try:
+            Ballot.objects.cast_ballots([ballot[1:] for ballot in ballots])
+        except (DatabaseError, ValidationError):
+            # Something was deleted after the checks or an entry is invalid, finding the failing entries one by one
+            for ballot in ballots:
+                try:
+                    Ballot.objects.cast_ballots([ballot[1:]])
+                except DatabaseError as e:
+                    journal.mark([ballot[0]], journal.REJECTED, str(e))
+                    failed.append(ballot[0])
+                except ValidationError as e:
+                    journal.mark([ballot[0]], journal.REJECTED, e.messages[0])
+                    failed.append(ballot[0])
+        journal.mark(
+            [id for id, _, _, _, _ in ballots if id not in failed], journal.COMMITTED
+        )
+        self.stdout.write(
+            f"Stored {len(ballots) - len(failed)} ballots, "
+            f"rejected {len(rejected) + len(deleted) + len(failed)} ballots"
+        )
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from primaries_app.models import StageTally
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the StageTally running totals from the Ballot table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stage", type=int, default=None, help="Rebuild only the given stage"
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare the running totals with the ballots, without rewriting them",
+        )
+
+    def handle(self, *args, **options):
+        stage = options["stage"]
+        tallies = StageTally.objects.all()
+        if stage is not None:
+            tallies = tallies.filter(stage=stage)
+        current = {
+            (s, c): (points, ballots)
+            for s, c, points, ballots in tallies.values_list(
+                "stage", "candidate", "points", "ballots"
+            )
+        }
+        expected = StageTally.objects.compute(stage)
+
+        mismatches = 0
+        for key in sorted(current.keys() | expected.keys()):
+            points, ballots = current.get(key, (0, 0))
+            expected_points, expected_ballots = expected.get(key, (0, 0))
+            if abs(points - expected_points) > 1e-6 or ballots != expected_ballots:
+                mismatches += 1
+                self.stdout.write(
+                    f"stage={key[0]} candidate={key[1]}: "
+                    f"points {points} != {expected_points}, ballots {ballots} != {expected_ballots}"
+                )
+
+        if options["check"]:
+            if mismatches:
+                raise CommandError(f"{mismatches} tallies are inconsistent")
+            self.stdout.write(self.style.SUCCESS("Tallies are consistent"))
+            return
+
+        StageTally.objects.rebuild(stage)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {len(expected)} tallies, {mismatches} were inconsistent"
+            )
+        )
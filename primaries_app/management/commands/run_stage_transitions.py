@@ -0,0 +1,79 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from primaries_app.models import ResultSnapshot, StageTransition
+
+
+class Command(BaseCommand):
+    help = "Resets the voters of the started stage transitions in chunks and changes the stage when they are reset"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk", type=int, default=1000, help="Users reset per transaction"
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to wait when there is no started transition",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when there is no started transition instead of waiting for one",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            transition = StageTransition.objects.active()
+            if transition is None:
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
+                continue
+            self.run_transition(transition, options["chunk"])
+
+    def run_transition(self, transition: StageTransition, chunk: int) -> None:
+        """
+        It advances the transition chunk by chunk until it is finished, the error of a failed chunk is saved and
+        raised, the next run continues from the last saved chunk
+
+        :param transition: The started transition
+        :param chunk: The number of users reset per transaction
+        """
+        try:
+            while not transition.advance(chunk):
+                self.stdout.write(
+                    f"Stage {transition.stage}: reset {transition.progress}"
+                )
+        except Exception as e:
+            StageTransition.objects.filter(pk=transition.pk).update(error=str(e))
+            raise
+        self.stdout.write(self.style.SUCCESS(f"Stage changed to {transition.stage}"))
+        if transition.finished_stage is not None:
+            self.freeze_results(transition.finished_stage)
+
+    def freeze_results(self, stage: int) -> None:
+        """
+        It takes the snapshot of the closed voting stage once no ballot of it can arrive anymore. Journaled ballots
+        may wait on every web host, which this worker can not see, so then the snapshot is left to snapshot_results
+
+        :param stage: The closed voting stage
+        """
+        if settings.BALLOT_JOURNAL:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Run snapshot_results {stage} once the ballot journal of every web host is drained"
+                )
+            )
+            return
+        # The web processes still holding the previous configs accept ballots for up to GLOBAL_CONFIGS_TTL seconds
+        time.sleep(settings.GLOBAL_CONFIGS_TTL)
+        snapshot = ResultSnapshot.objects.take(stage)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshot of stage {snapshot.stage} created, ETag {snapshot.etag}"
+            )
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from primaries_app.tally import RULES, score_stage
+
+
+class Command(BaseCommand):
+    help = "Computes the result of a voting stage under the given scoring rule"
+
+    def add_arguments(self, parser):
+        parser.add_argument("stage", type=int, help="The voting stage, 3 or 5")
+        parser.add_argument(
+            "--rule", choices=list(RULES), default="dowdall", help="The scoring rule"
+        )
+
+    def handle(self, *args, **options):
+        result = score_stage(options["stage"], options["rule"])
+        for place, (candidate, score) in enumerate(
+            sorted(result, key=lambda item: -item[1]), start=1
+        ):
+            self.stdout.write(f"{place}. candidate={candidate} score={score:.4f}")
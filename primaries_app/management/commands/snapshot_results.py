@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from primaries_app import journal
+from primaries_app.models import GlobalConfigs, ResultSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Freezes the current results of a finished voting stage into a new snapshot. Run it after the voting is "
+        "closed and the drain_ballots worker of every web host has stored its journal"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("stage", type=int, choices=(3, 5), help="The voting stage")
+
+    def handle(self, *args, **options):
+        stage = options["stage"]
+        if GlobalConfigs.objects.get(pk=1).stage == str(stage):
+            raise CommandError(f"Stage {stage} is still open")
+        pending = journal.count_pending(stage) if settings.BALLOT_JOURNAL else 0
+        if pending:
+            raise CommandError(
+                f"The ballot journal of this host still has {pending} ballots of stage {stage}"
+            )
+        snapshot = ResultSnapshot.objects.take(stage)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Snapshot of stage {snapshot.stage} created, ETag {snapshot.etag}"
+            )
+        )
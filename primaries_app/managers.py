@@ -0,0 +1,631 @@
+import hashlib
+import json
+import operator
+import struct
+from collections import defaultdict, namedtuple
+from functools import reduce
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    FloatField,
+    IntegerField,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+
+from accounts.session import invalidate_session_status
+
+from .evaluations import invalidate_evaluations
+from .richtext import RICH_TEXT_FIELDS, render
+from .search import build_document, invalidate_search
+
+
+# One position of a packed ballot, shaped like the rows of the former per position VotingModel table
+Vote = namedtuple("Vote", ("voter_id", "candidate_id", "position", "points", "stage"))
+
+
+def pack_candidates(candidate_ids: list) -> bytes:
+    """
+    It packs the candidate ids of a ballot into little-endian 32 bit integers
+
+    :param candidate_ids: list of candidate ids ordered by position
+    :return: The packed bytes.
+    """
+    return struct.pack(f"<{len(candidate_ids)}i", *candidate_ids)
+
+
+def unpack_candidates(data) -> tuple:
+    """
+    It unpacks the candidate ids packed by pack_candidates
+
+    :param data: bytes or memoryview, depending on the database backend
+    :return: tuple of candidate ids ordered by position.
+    """
+    data = bytes(data)
+    return struct.unpack(f"<{len(data) // 4}i", data)
+
+
+def existing_candidates(candidate_ids) -> set:
+    """
+    It picks the candidate profiles which still exist, the ballots keep the ids of the deleted ones
+
+    :param candidate_ids: iterable of candidate ids
+    :return: set of the ids of the existing profiles.
+    """
+    return set(
+        apps.get_model("accounts", "CandidateProfile")
+        .objects.filter(pk__in=set(candidate_ids))
+        .values_list("pk", flat=True)
+    )
+
+
+class BallotQuerySet(models.QuerySet):
+    def votes(self):
+        """
+        It unpacks the selected ballots into per position rows, the points of the candidate at position i are
+        votes_count / i
+
+        :return: generator of Vote tuples.
+        """
+        for voter_id, stage, candidates, votes_count in self.values_list(
+            "voter_id", "stage", "candidates", "votes_count"
+        ).iterator(chunk_size=2000):
+            for position, candidate_id in enumerate(
+                unpack_candidates(candidates), start=1
+            ):
+                yield Vote(
+                    voter_id, candidate_id, position, votes_count / position, stage
+                )
+
+
+class BallotManager(models.Manager.from_queryset(BallotQuerySet)):
+    """
+    Manager for Ballot which stores a whole ballot as one row
+    """
+
+    def build_ballot(self, voter_id: int, candidate_ids: list, stage, votes_count: int):
+        """
+        It creates the unsaved Ballot object
+
+        :param voter_id: The id of the VoterProfile of the voter
+        :param candidate_ids: list of candidate ids ordered by position
+        :param stage: The stage of the election
+        :param votes_count: The votes count of the voter
+        :return: Ballot object.
+        :raises ValidationError: if the ballot has no candidates, stage or votes count
+        """
+        if not candidate_ids:
+            raise ValidationError("Քվեաթերթիկը դատարկ է")
+        if stage is None:
+            raise ValidationError("Այս փուլում քվեարկություն չկա")
+        if not votes_count:
+            raise ValidationError("Ընտրողի ձայների քանակը նշված չէ")
+        return self.model(
+            voter_id=voter_id,
+            stage=int(stage),
+            candidates=pack_candidates(candidate_ids),
+            votes_count=votes_count,
+        )
+
+    def cast_ballot(self, voter_profile, candidate_ids: list, stage):
+        """
+        It stores the ballot, adds it to the running totals and marks the voter as already voted,
+        all inside one transaction, so a ballot is either stored completely or not at all
+
+        :param voter_profile: The VoterProfile object of the voter
+        :param candidate_ids: list of candidate ids ordered by position
+        :param stage: The stage of the election
+        :return: The created Ballot object.
+        :raises ValidationError: if the ballot has no candidates, stage or votes count
+        :raises IntegrityError: if the voter already has a ballot of the stage or a candidate was deleted meanwhile
+        """
+        ballot = self.build_ballot(
+            voter_profile.pk, candidate_ids, stage, voter_profile.votes_count
+        )
+        with transaction.atomic():
+            # The unique (voter, stage) constraint raises IntegrityError for a second ballot of the voter
+            ballot.save(force_insert=True)
+            apps.get_model("primaries_app", "StageTally").objects.add_votes(
+                ballot.votes()
+            )
+            voter_profile.already_voted = True
+            voter_profile.save(update_fields=["already_voted"])
+        return ballot
+
+    def cast_ballots(self, ballots: list) -> list:
+        """
+        It stores many ballots in one transaction with one bulk insert. Ballots of voters who already have a ballot
+        in the same stage are skipped
+
+        :param ballots: list of (voter id, candidate ids, stage, votes count) tuples
+        :type ballots: list
+        :return: The list of the stored ballots.
+        """
+        voter_model = apps.get_model("accounts", "VoterProfile")
+        voter_ids = {voter_id for voter_id, _, _, _ in ballots}
+        with transaction.atomic():
+            voted = set(
+                self.filter(voter_id__in=voter_ids).values_list("voter_id", "stage")
+            )
+            stored = []
+            for ballot in ballots:
+                key = (ballot[0], int(ballot[2]))
+                if key not in voted:
+                    voted.add(key)
+                    stored.append(ballot)
+            created = self.bulk_create(
+                [self.build_ballot(*ballot) for ballot in stored], batch_size=1000
+            )
+            apps.get_model("primaries_app", "StageTally").objects.add_votes(
+                [vote for ballot in created for vote in ballot.votes()]
+            )
+            voters = voter_model.objects.filter(
+                pk__in={voter_id for voter_id, _, _, _ in stored}
+            )
+            # The update bypasses the VoterProfile receivers which remove the cached session statuses
+            invalidate_session_status(voters.values_list("user_id", flat=True))
+            voters.update(already_voted=True)
+        return stored
+
+
+class EvaluateManager(models.Manager):
+    """
+    Manager for EvaluateModel which stores many evaluations of a voter at once
+    """
+
+    def upsert(self, voter_id: int, evaluations: list) -> tuple:
+        """
+        It creates or updates the evaluations of the voter with one bulk upsert on the unique (voter, candidate) pair
+        and updates the score counters, all inside one transaction
+
+        :param voter_id: The id of the VoterProfile of the voter
+        :param evaluations: list of (candidate id, poll id, mark) tuples, with unique candidates
+        :type evaluations: list
+        :return: The number of the created and the updated evaluations.
+        """
+        with transaction.atomic():
+            # Locking the voter row, so the counters see the evaluations of parallel requests of the same voter
+            apps.get_model("accounts", "VoterProfile").objects.select_for_update().only(
+                "pk"
+            ).get(pk=voter_id)
+            previous = dict(
+                self.filter(
+                    voter_id=voter_id,
+                    candidate_id__in=[candidate for candidate, _, _ in evaluations],
+                ).values_list("candidate", "poll__mark")
+            )
+            self.bulk_create(
+                [
+                    self.model(voter_id=voter_id, candidate_id=candidate, poll_id=poll)
+                    for candidate, poll, _ in evaluations
+                ],
+                update_conflicts=True,
+                # The column names, Django 4.1 puts the given names into the upsert SQL as they are
+                unique_fields=["voter_id", "candidate_id"],
+                update_fields=["poll_id"],
+            )
+            deltas = defaultdict(int)
+            for candidate, _, mark in evaluations:
+                if candidate in previous:
+                    deltas[(candidate, previous[candidate])] -= 1
+                deltas[(candidate, mark)] += 1
+            apps.get_model("primaries_app", "CandidateScore").objects.add_many(deltas)
+            invalidate_evaluations(voter_id)
+        return len(evaluations) - len(previous), len(previous)
+
+
+class CandidateScoreManager(models.Manager):
+    """
+    Manager for CandidateScore which keeps the number of evaluations of every candidate with every mark value
+    """
+
+    def add(self, candidate_id: int, mark: int, delta: int) -> None:
+        """
+        It adds delta evaluations with the mark to the counters of the candidate
+
+        :param candidate_id: The id of the candidate profile
+        :param mark: The mark value of the evaluation
+        :param delta: 1 for a new evaluation, -1 for a removed one
+        """
+        self.add_many({(candidate_id, mark): delta})
+
+    def add_many(self, deltas: dict) -> None:
+        """
+        It changes many counters with one insert and one update
+
+        :param deltas: dict where key is (candidate id, mark) and value is the number of evaluations to add
+        :type deltas: dict
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        # A removed evaluation always has its counter, and inserting it could recreate the counter of a candidate
+        # which is being deleted
+        self.bulk_create(
+            [
+                self.model(candidate_id=candidate, mark=mark)
+                for (candidate, mark), delta in deltas.items()
+                if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        pairs = [Q(candidate_id=candidate, mark=mark) for candidate, mark in deltas]
+        self.filter(reduce(operator.or_, pairs)).update(
+            count=F("count")
+            + Case(
+                *[
+                    When(candidate_id=candidate, mark=mark, then=Value(delta))
+                    for (candidate, mark), delta in deltas.items()
+                ],
+                output_field=IntegerField(),
+            )
+        )
+
+    def totals(self):
+        """
+        It sums mark * count for every candidate, reading at most one row per mark value of a candidate
+
+        :return: queryset of {"candidate": id, "points": sum} dicts ordered by candidate, candidates without
+        evaluations are not included
+        """
+        return (
+            self.filter(count__gt=0)
+            .values("candidate")
+            .order_by("candidate")
+            .annotate(points=Sum(F("mark") * F("count")))
+        )
+
+    def points(self, candidate_id: int) -> int:
+        """
+        It returns the sum of the marks of all evaluations of the candidate
+
+        :param candidate_id: The id of the candidate profile
+        :return: The sum of the marks.
+        """
+        return (
+            self.filter(candidate_id=candidate_id).aggregate(
+                points=Sum(F("mark") * F("count"))
+            )["points"]
+            or 0
+        )
+
+    def rebuild(self) -> None:
+        """It recomputes all counters from the EvaluateModel table, needed when the mark value of a MarkModel changes"""
+        counts = (
+            apps.get_model("primaries_app", "EvaluateModel")
+            .objects.values_list("candidate", "poll__mark")
+            .order_by()
+            .annotate(count=Count("id"))
+        )
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                [
+                    self.model(candidate_id=candidate, mark=mark, count=count)
+                    for candidate, mark, count in counts
+                ]
+            )
+
+
+class StageTallyManager(models.Manager):
+    """
+    Manager for StageTally which keeps the running totals of every (stage, candidate) pair
+    """
+
+    def add_votes(self, votes: list) -> None:
+        """
+        It adds the points of the given votes to the running totals, and counts one ballot for every candidate of
+        them. It should be called in the same transaction which creates the ballots
+
+        :param votes: iterable of Vote tuples
+        """
+        self._change_votes(votes, 1)
+
+    def subtract_votes(self, votes: list) -> None:
+        """
+        It takes the points and the ballots of the given votes back from the running totals. It should be called in
+        the same transaction which deletes the ballots
+
+        :param votes: iterable of Vote tuples
+        """
+        self._change_votes(votes, -1)
+
+    def _change_votes(self, votes: list, sign: int) -> None:
+        totals = defaultdict(lambda: [0.0, 0])
+        for vote in votes:
+            total = totals[(int(vote.stage), vote.candidate_id)]
+            total[0] += sign * vote.points
+            total[1] += sign
+        if sign > 0:
+            self.bulk_create(
+                [
+                    self.model(stage=stage, candidate_id=candidate)
+                    for stage, candidate in sorted(totals)
+                ],
+                ignore_conflicts=True,
+            )
+        for stage in sorted({stage for stage, _ in totals}):
+            changes = [(c, total) for (s, c), total in totals.items() if s == stage]
+            tallies = self.filter(stage=stage, candidate_id__in=[c for c, _ in changes])
+            # Locking the rows in the candidate order first, so parallel transactions wait for each other instead of
+            # locking the same rows in different orders and deadlocking
+            list(
+                tallies.select_for_update()
+                .order_by("candidate_id")
+                .values_list("pk", flat=True)
+            )
+            tallies.update(
+                points=F("points")
+                + Case(
+                    *[When(candidate_id=c, then=Value(t[0])) for c, t in changes],
+                    output_field=FloatField(),
+                ),
+                ballots=F("ballots")
+                + Case(
+                    *[When(candidate_id=c, then=Value(t[1])) for c, t in changes],
+                    output_field=IntegerField(),
+                ),
+            )
+
+    def compute(self, stage: int | None = None) -> dict:
+        """
+        It aggregates the totals from the Ballot table, without touching the StageTally table. The votes of deleted
+        candidates are left out, as their StageTally rows are deleted with them
+
+        :param stage: The stage to compute, if None all stages are computed
+        :return: dict where key is (stage, candidate id) and value is (points, ballots)
+        """
+        ballots = apps.get_model("primaries_app", "Ballot").objects.all()
+        if stage is not None:
+            ballots = ballots.filter(stage=stage)
+        totals = defaultdict(lambda: [0.0, 0])
+        for vote in ballots.votes():
+            total = totals[(vote.stage, vote.candidate_id)]
+            total[0] += vote.points
+            total[1] += 1
+        existing = existing_candidates(candidate for _, candidate in totals)
+        return {
+            key: tuple(total) for key, total in totals.items() if key[1] in existing
+        }
+
+    def rebuild(self, stage: int | None = None) -> dict:
+        """
+        It replaces the running totals with the totals computed from the Ballot table
+
+        :param stage: The stage to rebuild, if None all stages are rebuilt
+        :return: The computed totals.
+        """
+        totals = self.compute(stage)
+        with transaction.atomic():
+            tallies = self.all() if stage is None else self.filter(stage=stage)
+            tallies.delete()
+            self.bulk_create(
+                [
+                    self.model(stage=s, candidate_id=c, points=points, ballots=ballots)
+                    for (s, c), (points, ballots) in totals.items()
+                ]
+            )
+        return totals
+
+
+class ResultSnapshotManager(models.Manager):
+    """
+    Manager for ResultSnapshot which takes and finds the frozen results of the voting stages
+    """
+
+    def take(self, stage: int):
+        """
+        It computes the final totals and the per position ballot counts of every candidate of the stage and stores
+        them as a new snapshot. Deleted candidates are left out, as in the running totals
+
+        :param stage: The voting stage, 3 or 5
+        :type stage: int
+        :return: The created ResultSnapshot object.
+        """
+        points = defaultdict(float)
+        counts = defaultdict(lambda: defaultdict(int))
+        for vote in (
+            apps.get_model("primaries_app", "Ballot")
+            .objects.filter(stage=stage)
+            .order_by("id")
+            .votes()
+        ):
+            points[vote.candidate_id] += vote.points
+            counts[vote.candidate_id][vote.position] += 1
+        existing = existing_candidates(points)
+        points = {candidate: points[candidate] for candidate in existing}
+        counts = {candidate: counts[candidate] for candidate in existing}
+        totals = [[candidate, points[candidate]] for candidate in sorted(points)]
+        positions = {
+            str(candidate): {
+                str(position): counts[candidate][position]
+                for position in sorted(counts[candidate])
+            }
+            for candidate in sorted(counts)
+        }
+        etag = hashlib.sha256(
+            json.dumps(
+                [stage, totals, positions], sort_keys=True, cls=DjangoJSONEncoder
+            ).encode()
+        ).hexdigest()
+        return self.create(stage=stage, totals=totals, positions=positions, etag=etag)
+
+    def latest_for(self, stage: int):
+        """
+        It returns the newest snapshot of the stage
+
+        :param stage: The voting stage, 3 or 5
+        :type stage: int
+        :return: ResultSnapshot object or None if the stage has no snapshot.
+        """
+        return self.filter(stage=stage).order_by("-created_at", "-id").first()
+
+
+class StageTransitionManager(models.Manager):
+    """
+    Manager for StageTransition which starts and finds the stage transitions
+    """
+
+    def active(self):
+        """
+        It returns the oldest transition which is not finished
+
+        :return: StageTransition object or None.
+        """
+        return self.exclude(status=self.model.DONE).order_by("created_at", "id").first()
+
+    def last_finished(self):
+        """
+        It returns the newest finished transition
+
+        :return: StageTransition object or None.
+        """
+        return (
+            self.filter(status=self.model.DONE).order_by("-finished_at", "-id").first()
+        )
+
+    def start(self, stage):
+        """
+        It creates a transition to the stage, only one transition can run at a time
+
+        :param stage: The new stage
+        :return: The created StageTransition object.
+        """
+        with transaction.atomic():
+            if self.exclude(status=self.model.DONE).exists():
+                raise ValidationError("Փուլի փոփոխությունը արդեն ընթացքում է")
+            return self.create(
+                stage=stage,
+                total=apps.get_model("accounts", "User").objects.count(),
+            )
+
+
+class CandidateDocumentManager(models.Manager):
+    """
+    Manager for CandidateDocument which keeps the searched texts of the candidates and matches them with the full text
+    index of the database, an FTS5 table on SQLite and a GIN index of the tsvector on PostgreSQL
+    """
+
+    def refresh(self, candidate_id: int) -> None:
+        """
+        It rebuilds the document of the candidate from the profile and the posts, or deletes it if the profile is deleted
+
+        :param candidate_id: The id of the candidate profile
+        :type candidate_id: int
+        """
+        profile = (
+            apps.get_model("accounts", "CandidateProfile")
+            .objects.filter(pk=candidate_id)
+            .prefetch_related("candidatepost_set")
+            .first()
+        )
+        if profile is None:
+            self.filter(candidate_id=candidate_id).delete()
+        else:
+            self.update_or_create(
+                candidate_id=candidate_id,
+                defaults={
+                    "document": build_document(profile, profile.candidatepost_set.all())
+                },
+            )
+        invalidate_search()
+
+    def match(self, words: list) -> list:
+        """
+        It finds the documents having a word starting with every given word
+
+        :param words: The normalized words of the query
+        :type words: list
+        :return: list of candidate profile ids, the best matches first.
+        """
+        connection = connections[self.db]
+        table = self.model._meta.db_table
+        if connection.vendor == "sqlite":
+            sql = f"SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH %s ORDER BY rank"
+            query = " ".join(f'"{word}"*' for word in words)
+        elif connection.vendor == "postgresql":
+            sql = (
+                f"SELECT candidate_id FROM {table} "
+                "WHERE to_tsvector('simple', document) @@ to_tsquery('simple', %s) "
+                "ORDER BY ts_rank(to_tsvector('simple', document), to_tsquery('simple', %s)) DESC, candidate_id"
+            )
+            query = " & ".join(f"{word}:*" for word in words)
+        else:
+            documents = self.all()
+            for word in words:
+                documents = documents.filter(document__contains=word)
+            return list(
+                documents.order_by("candidate_id").values_list(
+                    "candidate_id", flat=True
+                )
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [query] * sql.count("%s"))
+            return [id for id, in cursor.fetchall()]
+
+
+class RichTextRenditionManager(models.Manager):
+    """
+    Manager for RichTextRendition which renders the rich text fields on save and reads the renditions of many objects
+    with one query
+    """
+
+    def refresh(self, instance, fields=None) -> None:
+        """
+        It renders the rich text fields of the object and stores the renditions, replacing the previous ones
+
+        :param instance: CandidateProfile, CandidatePost or News object
+        :param fields: The names of the fields to render, all rich text fields of the model by default
+        """
+        if fields is None:
+            fields = RICH_TEXT_FIELDS[instance._meta.label_lower]
+        content_type = ContentType.objects.get_for_model(instance)
+        self.bulk_create(
+            [
+                self.model(
+                    content_type=content_type,
+                    object_id=instance.pk,
+                    field=field,
+                    **render(getattr(instance, field))._asdict(),
+                )
+                for field in fields
+            ],
+            update_conflicts=True,
+            # Column names, Django 4.1 puts these names into the SQL as they are
+            unique_fields=["content_type_id", "object_id", "field"],
+            update_fields=["html", "text", "excerpt"],
+        )
+
+    def remove(self, instance) -> None:
+        """It deletes the renditions of the deleted object"""
+        self.filter(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk,
+        ).delete()
+
+    def of(self, model, ids, rendition: str) -> dict:
+        """
+        It reads one rendition of every rich text field of the objects
+
+        :param model: The model class of the objects
+        :param ids: The ids of the objects
+        :param rendition: "html", "text" or "excerpt"
+        :type rendition: str
+        :return: dict where key is the object id and value is a dict of the renditions by the field name
+        """
+        result = defaultdict(dict)
+        for object_id, field, value in self.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            object_id__in=ids,
+        ).values_list("object_id", "field", rendition):
+            result[object_id][field] = value
+        return result
@@ -0,0 +1,72 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def count_votes(apps, schema_editor):
+    VotingModel = apps.get_model("primaries_app", "VotingModel")
+    StageTally = apps.get_model("primaries_app", "StageTally")
+    StageTally.objects.bulk_create(
+        [
+            StageTally(
+                stage=stage, candidate_id=candidate, points=points, ballots=ballots
+            )
+            for stage, candidate, points, ballots in VotingModel.objects.values_list(
+                "stage", "candidate"
+            )
+            .order_by()
+            .annotate(points=Sum("points"), ballots=Count("id"))
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_alter_candidatepost_media_path_and_more"),
+        ("primaries_app", "0003_alter_markmodel_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StageTally",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stage", models.IntegerField(verbose_name="Ընտրության փուլը")),
+                (
+                    "points",
+                    models.FloatField(default=0, verbose_name="Միաորների Քանակը"),
+                ),
+                (
+                    "ballots",
+                    models.IntegerField(
+                        default=0, verbose_name="Քվեաթերթիկների Քանակը"
+                    ),
+                ),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="accounts.candidateprofile",
+                        verbose_name="Թեկնածու",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Քվեարկության ամփոփում",
+                "verbose_name_plural": "Քվեարկության ամփոփում",
+                "unique_together": {("stage", "candidate")},
+            },
+        ),
+        migrations.RunPython(count_votes, migrations.RunPython.noop),
+    ]
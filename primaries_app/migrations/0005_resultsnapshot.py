@@ -0,0 +1,42 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("primaries_app", "0004_stagetally"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResultSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stage", models.IntegerField(verbose_name="Ընտրության փուլը")),
+                ("totals", models.JSONField(verbose_name="Միավորները")),
+                (
+                    "positions",
+                    models.JSONField(verbose_name="Քվեաթերթիկները ըստ համարների"),
+                ),
+                ("etag", models.CharField(max_length=64, verbose_name="ETag")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Ստեղծվել է"),
+                ),
+            ],
+            options={
+                "verbose_name": "Արդյունքների պատկեր",
+                "verbose_name_plural": "Արդյունքների պատկերներ",
+            },
+        ),
+    ]
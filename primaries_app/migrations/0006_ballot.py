@@ -0,0 +1,144 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:43
+
+import struct
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def first_ballot(votes):
+    # The former VoteView did not check already_voted in every stage, so a voter can have more than one ballot of a
+    # stage. A ballot was created row by row in the order of the positions, so the first ballot is the run of rows
+    # with the positions 1, 2, 3... starting at the first row by id, the rows after it belong to the other ballots,
+    # which are dropped
+    ballot = []
+    for vote in votes:
+        _, _, _, position, _ = vote
+        if position != len(ballot) + 1:
+            break
+        ballot.append(vote)
+    return ballot
+
+
+def pack_votes(apps, schema_editor):
+    VotingModel = apps.get_model("primaries_app", "VotingModel")
+    Ballot = apps.get_model("primaries_app", "Ballot")
+    rows = (
+        VotingModel.objects.order_by("voter_id", "stage", "id")
+        .values_list("voter_id", "stage", "candidate_id", "position", "points")
+        .iterator(chunk_size=2000)
+    )
+    ballots = []
+    for (voter_id, stage), votes in groupby(rows, key=lambda row: row[:2]):
+        votes = first_ballot(votes)
+        if not votes:
+            continue
+        candidate_ids = [candidate_id for _, _, candidate_id, _, _ in votes]
+        # The points of the first position are the votes count of the voter
+        _, _, _, position, points = votes[0]
+        ballots.append(
+            Ballot(
+                voter_id=voter_id,
+                stage=stage,
+                candidates=struct.pack(f"<{len(candidate_ids)}i", *candidate_ids),
+                votes_count=round(points * position),
+            )
+        )
+    Ballot.objects.bulk_create(ballots, batch_size=1000)
+
+
+def count_ballots(apps, schema_editor):
+    # The running totals are rebuilt from the packed ballots, so they match the Ballot table exactly
+    Ballot = apps.get_model("primaries_app", "Ballot")
+    StageTally = apps.get_model("primaries_app", "StageTally")
+    totals = defaultdict(lambda: [0.0, 0])
+    for stage, candidates, votes_count in Ballot.objects.values_list(
+        "stage", "candidates", "votes_count"
+    ).iterator(chunk_size=2000):
+        data = bytes(candidates)
+        candidate_ids = struct.unpack(f"<{len(data) // 4}i", data)
+        for position, candidate_id in enumerate(candidate_ids, start=1):
+            total = totals[(stage, candidate_id)]
+            total[0] += votes_count / position
+            total[1] += 1
+    StageTally.objects.all().delete()
+    StageTally.objects.bulk_create(
+        [
+            StageTally(
+                stage=stage, candidate_id=candidate, points=points, ballots=ballots
+            )
+            for (stage, candidate), (points, ballots) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def unpack_ballots(apps, schema_editor):
+    VotingModel = apps.get_model("primaries_app", "VotingModel")
+    Ballot = apps.get_model("primaries_app", "Ballot")
+    votes = []
+    for ballot in Ballot.objects.iterator(chunk_size=2000):
+        data = bytes(ballot.candidates)
+        candidate_ids = struct.unpack(f"<{len(data) // 4}i", data)
+        for position, candidate_id in enumerate(candidate_ids, start=1):
+            votes.append(
+                VotingModel(
+                    voter_id=ballot.voter_id,
+                    candidate_id=candidate_id,
+                    position=position,
+                    points=1 / position * ballot.votes_count,
+                    stage=ballot.stage,
+                )
+            )
+    VotingModel.objects.bulk_create(votes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_alter_candidatepost_media_path_and_more"),
+        ("primaries_app", "0005_resultsnapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Ballot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stage", models.IntegerField(verbose_name="Ընտրության փուլը")),
+                (
+                    "candidates",
+                    models.BinaryField(verbose_name="Թեկնածուները ըստ համարների"),
+                ),
+                ("votes_count", models.IntegerField(verbose_name="Ձայների Քանակը")),
+                (
+                    "voter",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="accounts.voterprofile",
+                        verbose_name="Ընտրող",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Քվեաթերթիկ",
+                "verbose_name_plural": "Քվեաթերթիկներ",
+                "unique_together": {("voter", "stage")},
+            },
+        ),
+        migrations.RunPython(pack_votes, unpack_ballots),
+        migrations.RunPython(count_ballots, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name="VotingModel",
+        ),
+    ]
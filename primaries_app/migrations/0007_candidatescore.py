@@ -0,0 +1,64 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def count_evaluations(apps, schema_editor):
+    EvaluateModel = apps.get_model("primaries_app", "EvaluateModel")
+    CandidateScore = apps.get_model("primaries_app", "CandidateScore")
+    CandidateScore.objects.bulk_create(
+        [
+            CandidateScore(candidate_id=candidate, mark=mark, count=count)
+            for candidate, mark, count in EvaluateModel.objects.values_list(
+                "candidate", "poll__mark"
+            )
+            .order_by()
+            .annotate(count=Count("id"))
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_alter_candidatepost_media_path_and_more"),
+        ("primaries_app", "0006_ballot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CandidateScore",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("mark", models.SmallIntegerField(verbose_name="Գնահատական")),
+                (
+                    "count",
+                    models.IntegerField(default=0, verbose_name="Գնահատումների Քանակը"),
+                ),
+                (
+                    "candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="accounts.candidateprofile",
+                        verbose_name="Թեկնածու",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Գնահատականների ամփոփում",
+                "verbose_name_plural": "Գնահատականների ամփոփում",
+                "unique_together": {("candidate", "mark")},
+            },
+        ),
+        migrations.RunPython(count_evaluations, migrations.RunPython.noop),
+    ]
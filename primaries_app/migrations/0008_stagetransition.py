@@ -0,0 +1,92 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("primaries_app", "0007_candidatescore"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StageTransition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "stage",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("1", "ՈՐԱԿԱՎՈՐՄԱՆ ՓՈՒԼ"),
+                            ("2", "ՀԻՄՆԱԿԱՆ ՓՈՒԼ․ ՔՆՆԱՐԿՈՒՄՆԵՐ ԵՎ ԸՆՏՐՈՂՆԵՐԻ ԳՐԱՆՑՈՒՄ"),
+                            ("3", "ՀԻՄՆԱԿԱՆ ՓՈՒԼ․ ՔՎԵԱՐԿՈՒԹՅՈՒՆ"),
+                            (
+                                "4",
+                                "ԵԶՐԱՓՈԿԻՉ ՓՈՒԼ․ ՔՆՆԱՐԿՈՒՄՆԵՐ ԵՎ ԸՆՏՐՈՂՆԵՐԻ ԳՐԱՆՑՈՒՄ",
+                            ),
+                            ("5", "ԵԶՐԱՓԱԿԻՉ  ՓՈՒԼ․ ՔՎԵԱՐԿՈՒԹՅՈՒՆ"),
+                            (None, "Ոչ ակտիվ փուլ"),
+                        ],
+                        max_length=1,
+                        null=True,
+                        verbose_name="Նոր փուլը",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Սպասում է"),
+                            ("running", "Ընթացքում է"),
+                            ("done", "Ավարտված է"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                        verbose_name="Կարգավիճակ",
+                    ),
+                ),
+                (
+                    "cursor",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Վերջին մշակված օգտատերը"
+                    ),
+                ),
+                (
+                    "total",
+                    models.IntegerField(default=0, verbose_name="Օգտատերերի Քանակը"),
+                ),
+                (
+                    "done",
+                    models.IntegerField(default=0, verbose_name="Մշակված Օգտատերեր"),
+                ),
+                (
+                    "error",
+                    models.TextField(blank=True, default="", verbose_name="Սխալ"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Ստեղծվել է"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Ավարտվել է"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Փուլի փոփոխություն",
+                "verbose_name_plural": "Փուլի փոփոխություններ",
+            },
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 4.1.1 on 2026-10-18 15:58
+
+import html
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.html import strip_tags
+
+
+TABLE = "primaries_app_candidatedocument"
+
+# An external content FTS5 table kept in sync with the documents by triggers
+SQLITE_INDEX = [
+    f"CREATE VIRTUAL TABLE {TABLE}_fts USING fts5("
+    f"document, content='{TABLE}', content_rowid='candidate_id', tokenize='unicode61', prefix='2 3')",
+    f"CREATE TRIGGER {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+    f"INSERT INTO {TABLE}_fts (rowid, document) VALUES (new.candidate_id, new.document); END",
+    f"CREATE TRIGGER {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+    f"INSERT INTO {TABLE}_fts ({TABLE}_fts, rowid, document) VALUES ('delete', old.candidate_id, old.document); END",
+    f"CREATE TRIGGER {TABLE}_au AFTER UPDATE ON {TABLE} BEGIN "
+    f"INSERT INTO {TABLE}_fts ({TABLE}_fts, rowid, document) VALUES ('delete', old.candidate_id, old.document); "
+    f"INSERT INTO {TABLE}_fts (rowid, document) VALUES (new.candidate_id, new.document); END",
+]
+SQLITE_DROP = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_{name}" for name in ("ai", "ad", "au")
+] + [f"DROP TABLE IF EXISTS {TABLE}_fts"]
+
+POSTGRES_INDEX = [
+    f"CREATE INDEX {TABLE}_document_gin ON {TABLE} USING gin (to_tsvector('simple', document))"
+]
+POSTGRES_DROP = [f"DROP INDEX IF EXISTS {TABLE}_document_gin"]
+
+
+def create_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+# Frozen copies of primaries_app.search.normalize and build_document, so later changes of the search do not change
+# what this migration builds
+BIO_FIELDS = (
+    "education",
+    "work_experience",
+    "political_experience",
+    "marital_status",
+    "political_opinion",
+    "yerevan_rebuild",
+)
+_INNER_MARKS = re.compile("[՚-՟]")
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text):
+    text = html.unescape(strip_tags(text or ""))
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _INNER_MARKS.sub("", text).replace("եւ", "եվ")
+    return " ".join(_WORD.findall(text))
+
+
+def build_document(profile, posts):
+    parts = [profile.first_name, profile.last_name, profile.party]
+    parts += [getattr(profile, field) for field in BIO_FIELDS]
+    for post in posts:
+        parts += [post.title, post.text]
+    return " ".join(filter(None, map(normalize, parts)))
+
+
+def build_documents(apps, schema_editor):
+    CandidateProfile = apps.get_model("accounts", "CandidateProfile")
+    CandidateDocument = apps.get_model("primaries_app", "CandidateDocument")
+    CandidateDocument.objects.bulk_create(
+        [
+            CandidateDocument(
+                candidate=profile,
+                document=build_document(profile, profile.candidatepost_set.all()),
+            )
+            for profile in CandidateProfile.objects.prefetch_related(
+                "candidatepost_set"
+            )
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0008_candidateprofile_facet_indexes"),
+        ("primaries_app", "0008_stagetransition"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CandidateDocument",
+            fields=[
+                (
+                    "candidate",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="accounts.candidateprofile",
+                        verbose_name="Թեկնածու",
+                    ),
+                ),
+                ("document", models.TextField(verbose_name="Տեքստ")),
+            ],
+            options={
+                "verbose_name": "Որոնման փաստաթուղթ",
+                "verbose_name_plural": "Որոնման փաստաթղթեր",
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(build_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.1 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("primaries_app", "0010_richtextrendition"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="news",
+            index=models.Index(
+                fields=["created_at", "id"], name="primaries_a_created_08e9d9_idx"
+            ),
+        ),
+    ]
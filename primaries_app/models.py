@@ -1,14 +1,37 @@
+import time
+
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models.signals import post_save, pre_save
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.safestring import mark_safe
 
-from accounts.models import CandidateProfile, User, VoterProfile
-from accounts.utils import send_mailgun_mail
+from accounts.models import CandidatePost, CandidateProfile, User, VoterProfile
+from accounts.session import invalidate_session_status
+from accounts.utils import bump_version, send_mailgun_mail
+
+from .candidates import invalidate_candidate
+from .evaluations import invalidate_evaluations, invalidate_marks
+from .managers import (
+    BallotManager,
+    CandidateDocumentManager,
+    CandidateScoreManager,
+    EvaluateManager,
+    ResultSnapshotManager,
+    RichTextRenditionManager,
+    StageTallyManager,
+    StageTransitionManager,
+    Vote,
+    unpack_candidates,
+)
+from .richtext import RICH_TEXT_FIELDS
+from .roster import invalidate_roster, is_eligible
+
 
 choice_stage = (
     ("1", "ՈՐԱԿԱՎՈՐՄԱՆ ՓՈՒԼ"),
@@ -19,6 +42,9 @@ choice_stage = (
     (None, "Ոչ ակտիվ փուլ"),
 )
 
+# Moving to these stages resets the payments and the votes of all voters
+reset_stages = ("1", "2", "4", None)
+
 
 class MarkModel(models.Model):
     """A model for creating texts and marks for evaluating candidates"""
@@ -56,12 +82,14 @@ class EvaluateModel(models.Model):
         MarkModel, on_delete=models.CASCADE, verbose_name="Ինչպես է գնահատել՞"
     )
 
+    objects = EvaluateManager()
+
     def clean(self):
         """
             Check if requested user candidate
         :return: if requested user not  candidate  raise error
         """
-        if self.candidate.user not in User.objects.filter(is_candidate=True):
+        if not is_eligible(self.candidate_id):
             raise ValidationError("Can vote only for candidates")
 
     def save(self, *args, **kwargs):
@@ -85,6 +113,92 @@ class EvaluateModel(models.Model):
         verbose_name_plural = "Վստահություն Քվեարկում"
 
 
+class CandidateScore(models.Model):
+    """Number of evaluations of a candidate with a mark value, maintained by the EvaluateModel receivers"""
+
+    candidate = models.ForeignKey(
+        CandidateProfile, on_delete=models.CASCADE, verbose_name="Թեկնածու"
+    )
+    mark = models.SmallIntegerField(verbose_name="Գնահատական")
+    count = models.IntegerField(default=0, verbose_name="Գնահատումների Քանակը")
+
+    objects = CandidateScoreManager()
+
+    class Meta:
+        unique_together = (
+            "candidate",
+            "mark",
+        )
+        verbose_name = "Գնահատականների ամփոփում"
+        verbose_name_plural = "Գնահատականների ամփոփում"
+
+
+@receiver(post_init, sender=EvaluateModel)
+def post_init_evaluate(sender, instance, **kwargs) -> None:
+    instance._loaded_poll_id = instance.__dict__.get("poll_id")
+
+
+@receiver(post_save, sender=EvaluateModel)
+def post_save_evaluate(sender, instance, created, **kwargs) -> None:
+    """
+    It counts a new evaluation, or moves a changed one from the previous mark to the new one
+
+    :param sender: The model class
+    :param instance: The saved EvaluateModel object
+    :param created: True if a new evaluation was created
+    """
+    if created:
+        CandidateScore.objects.add(instance.candidate_id, instance.poll.mark, 1)
+    elif instance.poll_id != instance._loaded_poll_id:
+        previous = MarkModel.objects.get(pk=instance._loaded_poll_id).mark
+        CandidateScore.objects.add(instance.candidate_id, previous, -1)
+        CandidateScore.objects.add(instance.candidate_id, instance.poll.mark, 1)
+    instance._loaded_poll_id = instance.poll_id
+    invalidate_evaluations(instance.voter_id)
+
+
+@receiver(post_delete, sender=EvaluateModel)
+def post_delete_evaluate(sender, instance, **kwargs) -> None:
+    """
+    It takes the deleted evaluation back from the counters, in the transaction which deletes it, so the counter and
+    the evaluation are changed together or not at all
+
+    :param sender: The model class
+    :param instance: The deleted EvaluateModel object
+    """
+    with transaction.atomic(savepoint=False):
+        # Evaluations deleted with their MarkModel are deleted before it, so the mark can usually still be read
+        mark = (
+            MarkModel.objects.filter(pk=instance.poll_id)
+            .values_list("mark", flat=True)
+            .first()
+        )
+        if mark is None:
+            # The MarkModel is already gone with its value, the counter of the evaluation can not be found
+            CandidateScore.objects.rebuild()
+        else:
+            CandidateScore.objects.add(instance.candidate_id, mark, -1)
+    invalidate_evaluations(instance.voter_id)
+
+
+@receiver(post_init, sender=MarkModel)
+def post_init_mark(sender, instance, **kwargs) -> None:
+    instance._loaded_mark = instance.__dict__.get("mark")
+
+
+@receiver(post_save, sender=MarkModel)
+def post_save_mark(sender, instance, created, **kwargs) -> None:
+    if not created and instance.mark != instance._loaded_mark:
+        CandidateScore.objects.rebuild()
+    invalidate_marks()
+    instance._loaded_mark = instance.mark
+
+
+@receiver(post_delete, sender=MarkModel)
+def post_delete_mark(sender, instance, **kwargs) -> None:
+    invalidate_marks()
+
+
 class News(models.Model):
     title = models.CharField(max_length=1000, verbose_name="Վերնագիր")
     text = RichTextUploadingField(blank=True, null=True, verbose_name="Տեքստ")
@@ -106,6 +220,18 @@ class News(models.Model):
     class Meta:
         verbose_name = "Նորություններ"
         verbose_name_plural = "Նորություններ"
+        # The news feed pages by created_at, id from the newest
+        indexes = [models.Index(fields=["created_at", "id"])]
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def post_change_news(sender, instance, **kwargs) -> None:
+    transaction.on_commit(lambda: bump_version("news"))
+
+
+# The copy of GlobalConfigs cached in the process by GlobalConfigs.load
+_configs = {"object": None, "checked_at": 0.0}
 
 
 class GlobalConfigs(models.Model):
@@ -133,38 +259,234 @@ class GlobalConfigs(models.Model):
 
     @classmethod
     def load(cls):
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
+        """
+        It returns the configs from the copy cached in the process. The copy is trusted for GLOBAL_CONFIGS_TTL seconds,
+        after that the row is read again, so a stage change reaches every worker within GLOBAL_CONFIGS_TTL seconds
+        whatever the cache backend is
+
+        :return: The GlobalConfigs object, it is shared and must not be changed
+        """
+        now = time.monotonic()
+        if (
+            _configs["object"] is None
+            or now - _configs["checked_at"] >= settings.GLOBAL_CONFIGS_TTL
+        ):
+            obj, created = cls.objects.get_or_create(pk=1)
+            _configs.update(object=obj, checked_at=now)
+        return _configs["object"]
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """It makes the current process read the configs again on the next load, the others read them within the TTL"""
+        _configs["object"] = None
 
 
 @receiver(post_save, sender=GlobalConfigs)
-def post_save_confs(sender, instance, **kwargs) -> None:
-    set_unpaid = ["1", "2", "4", None]
-
-    if (
-        instance.stage in set_unpaid
-        and GlobalConfigs.objects.get(id=1).stage != instance.stage
-    ):
-        VoterProfile.objects.all().update(
-            is_paid=False, votes_count=None, already_voted=False
+def post_save_reload_confs(sender, instance, **kwargs) -> None:
+    transaction.on_commit(GlobalConfigs.invalidate)
+
+
+class StageTransition(models.Model):
+    """
+    A change of the stage which first resets all voters in primary key chunks, the stage is changed only when the
+    reset is finished. The cursor is saved after every chunk, so a stopped worker continues where it stopped
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+
+    stage = models.CharField(
+        choices=choice_stage,
+        blank=True,
+        null=True,
+        max_length=1,
+        verbose_name="Նոր փուլը",
+    )
+    status = models.CharField(
+        choices=(
+            (PENDING, "Սպասում է"),
+            (RUNNING, "Ընթացքում է"),
+            (DONE, "Ավարտված է"),
+        ),
+        default=PENDING,
+        max_length=10,
+        verbose_name="Կարգավիճակ",
+    )
+    cursor = models.BigIntegerField(default=0, verbose_name="Վերջին մշակված օգտատերը")
+    total = models.IntegerField(default=0, verbose_name="Օգտատերերի Քանակը")
+    done = models.IntegerField(default=0, verbose_name="Մշակված Օգտատերեր")
+    error = models.TextField(blank=True, default="", verbose_name="Սխալ")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ստեղծվել է")
+    finished_at = models.DateTimeField(blank=True, null=True, verbose_name="Ավարտվել է")
+
+    objects = StageTransitionManager()
+
+    class Meta:
+        verbose_name = "Փուլի փոփոխություն"
+        verbose_name_plural = "Փուլի փոփոխություններ"
+
+    def __str__(self):
+        return f"{self.get_stage_display()} ({self.progress})"
+
+    @property
+    def progress(self) -> str:
+        if self.status == self.DONE:
+            return "100%"
+        return f"{self.done}/{self.total} ({self.done * 100 // max(self.total, 1)}%)"
+
+    @property
+    def finished_stage(self) -> int | None:
+        """The voting stage which ends with this transition, its results are frozen into a snapshot"""
+        return {"4": 3, None: 5}.get(self.stage)
+
+    @property
+    def needs_snapshot(self) -> bool:
+        """A finished transition which closed a voting stage whose results were not frozen since"""
+        return (
+            self.status == self.DONE
+            and self.finished_stage is not None
+            and not ResultSnapshot.objects.filter(
+                stage=self.finished_stage, created_at__gte=self.finished_at
+            ).exists()
         )
-        User.objects.all().update(is_voter=False)
 
+    @property
+    def is_stalled(self) -> bool:
+        """A transition which is not picked by the worker for too long, the worker is probably not running"""
+        waiting = timezone.now() - self.created_at
+        return (
+            self.status == self.PENDING
+            and waiting.total_seconds() > settings.STAGE_TRANSITION_WARN_AFTER
+        )
+
+    def advance(self, chunk_size: int) -> bool:
+        """
+        It resets the next chunk of users and their voter profiles, or changes the stage if no users are left
+
+        :param chunk_size: The number of users reset in one transaction
+        :type chunk_size: int
+        :return: True if the transition is finished.
+        """
+        users = list(
+            User.objects.filter(pk__gt=self.cursor)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        with transaction.atomic():
+            if users:
+                VoterProfile.objects.filter(user_id__in=users).update(
+                    is_paid=False, votes_count=None, already_voted=False
+                )
+                User.objects.filter(pk__in=users).update(is_voter=False)
+                # The updates bypass the receivers which remove the cached session statuses
+                invalidate_session_status(users)
+                self.cursor = users[-1]
+                self.done += len(users)
+                self.status = self.RUNNING
+                # The chunk went through, so the error of a previous run is fixed
+                self.error = ""
+                self.save(update_fields=["cursor", "done", "status", "error"])
+                return False
+
+            configs = GlobalConfigs.objects.select_for_update().get(pk=1)
+            configs.stage = self.stage
+            configs.save()
+            self.status = self.DONE
+            self.error = ""
+            self.finished_at = timezone.now()
+            self.save(update_fields=["status", "error", "finished_at"])
+        return True
+
+
+class Ballot(models.Model):
+    """A whole ballot of a voter in one row, the candidate ids are packed in the order of their positions"""
 
-class VotingModel(models.Model):
     voter = models.ForeignKey(
         VoterProfile, on_delete=models.CASCADE, verbose_name="Ընտրող"
     )
+    stage = models.IntegerField(verbose_name="Ընտրության փուլը")
+    candidates = models.BinaryField(verbose_name="Թեկնածուները ըստ համարների")
+    votes_count = models.IntegerField(verbose_name="Ձայների Քանակը")
+
+    objects = BallotManager()
+
+    class Meta:
+        unique_together = (
+            "voter",
+            "stage",
+        )
+        verbose_name = "Քվեաթերթիկ"
+        verbose_name_plural = "Քվեաթերթիկներ"
+
+    @property
+    def candidate_ids(self) -> tuple:
+        return unpack_candidates(self.candidates)
+
+    def votes(self) -> list:
+        """
+        It unpacks the ballot into per position rows
+
+        :return: list of Vote tuples.
+        """
+        return [
+            Vote(
+                self.voter_id,
+                candidate_id,
+                position,
+                self.votes_count / position,
+                self.stage,
+            )
+            for position, candidate_id in enumerate(self.candidate_ids, start=1)
+        ]
+
+
+class StageTally(models.Model):
+    """Running totals of the votes of every candidate in every stage, maintained by Ballot.objects.cast_ballot"""
+
+    stage = models.IntegerField(verbose_name="Ընտրության փուլը")
     candidate = models.ForeignKey(
         CandidateProfile, on_delete=models.CASCADE, verbose_name="Թեկնածու"
     )
-    position = models.IntegerField(verbose_name="Համարը")
-    points = models.FloatField(default=None, verbose_name="Միաորների Քանակը")
-    stage = models.IntegerField(default=None, verbose_name="Ընտրության փուլը")
+    points = models.FloatField(default=0, verbose_name="Միաորների Քանակը")
+    ballots = models.IntegerField(default=0, verbose_name="Քվեաթերթիկների Քանակը")
+
+    objects = StageTallyManager()
 
     class Meta:
-        verbose_name = "Քվեարկության արդյունքներ"
-        verbose_name_plural = "Քվեարկության արդյունքներ"
+        unique_together = (
+            "stage",
+            "candidate",
+        )
+        verbose_name = "Քվեարկության ամփոփում"
+        verbose_name_plural = "Քվեարկության ամփոփում"
+
+
+@receiver(post_delete, sender=Ballot)
+def post_delete_ballot(sender, instance, **kwargs) -> None:
+    # Deleted with the voter profile as well, the running totals lose the votes of the ballot
+    StageTally.objects.subtract_votes(instance.votes())
+
+
+class ResultSnapshot(models.Model):
+    """Frozen results of a finished voting stage, they are never changed after creation"""
+
+    stage = models.IntegerField(verbose_name="Ընտրության փուլը")
+    totals = models.JSONField(verbose_name="Միավորները")
+    positions = models.JSONField(verbose_name="Քվեաթերթիկները ըստ համարների")
+    etag = models.CharField(max_length=64, verbose_name="ETag")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ստեղծվել է")
+
+    objects = ResultSnapshotManager()
+
+    class Meta:
+        verbose_name = "Արդյունքների պատկեր"
+        verbose_name_plural = "Արդյունքների պատկերներ"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValidationError("Result snapshots can not be changed")
+        super(ResultSnapshot, self).save(*args, **kwargs)
 
 
 class PayViaImage(models.Model):
@@ -204,4 +526,133 @@ def post_save_image(sender, instance, created, **kwargs) -> None:
             subject="ՎՃարում",
             message=f"{instance.voter_profile.first_name + ' ' + instance.voter_profile.last_name } ընտրողը ուղղարկել է"
             f" վճարման կտրոն խնդրում ենք ստուգեք այն և հաստատեք նրա ընտրողի կարգավիճակը։ id={instance.id}",
-        )
\ No newline at end of file
+        )
+
+
+@receiver(post_save, sender=CandidateProfile)
+@receiver(post_delete, sender=CandidateProfile)
+@receiver(post_delete, sender=User)
+def post_change_candidate(sender, instance, **kwargs) -> None:
+    # After the commit, otherwise another process could load the old rows under the new stamp
+    transaction.on_commit(invalidate_roster)
+
+
+@receiver(post_save, sender=CandidateProfile)
+@receiver(post_delete, sender=CandidateProfile)
+@receiver(post_save, sender=CandidatePost)
+@receiver(post_delete, sender=CandidatePost)
+def post_change_candidate_page(sender, instance, **kwargs) -> None:
+    candidate_id = instance.pk if sender is CandidateProfile else instance.profile_id
+    transaction.on_commit(lambda: invalidate_candidate(candidate_id))
+
+
+class RichTextRendition(models.Model):
+    """
+    The sanitized HTML, the plain text and the excerpt of a rich text field, rendered on save by the receivers of the
+    models in RICH_TEXT_FIELDS, so the responses never parse the stored HTML
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    field = models.CharField(max_length=50, verbose_name="Դաշտ")
+    html = models.TextField(verbose_name="HTML")
+    text = models.TextField(verbose_name="Տեքստ")
+    excerpt = models.TextField(verbose_name="Համառոտ")
+
+    objects = RichTextRenditionManager()
+
+    class Meta:
+        unique_together = (
+            "content_type",
+            "object_id",
+            "field",
+        )
+        verbose_name = "Տեքստի տարբերակ"
+        verbose_name_plural = "Տեքստի տարբերակներ"
+
+
+@receiver(post_init, sender=CandidateProfile)
+@receiver(post_init, sender=CandidatePost)
+@receiver(post_init, sender=News)
+def post_init_rich_text(sender, instance, **kwargs) -> None:
+    # Deferred fields are not in __dict__, reading them from there does not load them
+    instance._loaded_rich_text = {
+        field: instance.__dict__.get(field)
+        for field in RICH_TEXT_FIELDS[sender._meta.label_lower]
+    }
+
+
+@receiver(post_save, sender=CandidateProfile)
+@receiver(post_save, sender=CandidatePost)
+@receiver(post_save, sender=News)
+def post_save_rich_text(sender, instance, created, **kwargs) -> None:
+    """
+    It renders the rich text fields which were changed by the save
+
+    :param sender: The model class
+    :param instance: The saved object
+    :param created: True if the object was created
+    """
+    changed = [
+        field
+        for field in RICH_TEXT_FIELDS[sender._meta.label_lower]
+        if field in instance.__dict__
+        and (created or instance.__dict__[field] != instance._loaded_rich_text[field])
+    ]
+    if changed:
+        RichTextRendition.objects.refresh(instance, changed)
+        instance._loaded_rich_text.update(
+            {field: instance.__dict__[field] for field in changed}
+        )
+
+
+@receiver(post_delete, sender=CandidateProfile)
+@receiver(post_delete, sender=CandidatePost)
+@receiver(post_delete, sender=News)
+def post_delete_rich_text(sender, instance, **kwargs) -> None:
+    RichTextRendition.objects.remove(instance)
+
+
+class CandidateDocument(models.Model):
+    """
+    The normalized searched text of a candidate, maintained by the CandidateProfile and CandidatePost receivers. The
+    full text index over it is created by the migration, because it differs between the database backends
+    """
+
+    candidate = models.OneToOneField(
+        CandidateProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Թեկնածու",
+    )
+    document = models.TextField(verbose_name="Տեքստ")
+
+    objects = CandidateDocumentManager()
+
+    class Meta:
+        verbose_name = "Որոնման փաստաթուղթ"
+        verbose_name_plural = "Որոնման փաստաթղթեր"
+
+
+@receiver(post_save, sender=CandidateProfile)
+@receiver(post_delete, sender=CandidateProfile)
+@receiver(post_save, sender=CandidatePost)
+@receiver(post_delete, sender=CandidatePost)
+def post_change_candidate_document(sender, instance, **kwargs) -> None:
+    candidate_id = instance.pk if sender is CandidateProfile else instance.profile_id
+    transaction.on_commit(lambda: CandidateDocument.objects.refresh(candidate_id))
+
+
+@receiver(post_init, sender=User)
+def post_init_user(sender, instance, **kwargs) -> None:
+    # Remembering the loaded value, so saves which do not change it (logins, voter updates) keep the roster.
+    # Reading it from __dict__ does not load the field if it is deferred.
+    instance._loaded_is_candidate = instance.__dict__.get("is_candidate")
+
+
+@receiver(post_save, sender=User)
+def post_save_candidate_user(sender, instance, created, **kwargs) -> None:
+    is_candidate = instance.__dict__.get("is_candidate")
+    if is_candidate != instance._loaded_is_candidate:
+        transaction.on_commit(invalidate_roster)
+    instance._loaded_is_candidate = is_candidate
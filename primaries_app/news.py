@@ -0,0 +1,105 @@
+import base64
+import datetime
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from accounts.utils import get_version
+
+from .models import News, RichTextRendition
+from .serializers import NewsListSerializer, NewsSerializer, NewsTitleSerializer
+
+
+# Number of news on a page when the request does not ask for another number, and the maximum number
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# The list modes, "excerpt" ships the excerpt of the text and "title" ships no text at all
+LIST_MODES = ("excerpt", "title")
+
+# Seconds a page or a news stays cached, every News change replaces them earlier
+NEWS_TIMEOUT = 60 * 60
+
+
+def encode_cursor(created_at: datetime.datetime, id: int) -> str:
+    """It makes the opaque cursor of the page starting after the given news"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    It reads the cursor made by encode_cursor
+
+    :param cursor: The cursor from the query params
+    :type cursor: str
+    :return: (created_at, id) of the last news of the previous page.
+    :raises ValueError: if the cursor is malformed
+    """
+    # Every decoding and parsing error is a ValueError
+    created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.datetime.fromisoformat(created_at), int(id)
+
+
+def get_news_page(cursor: str | None, limit: int, mode: str) -> dict:
+    """
+    It returns a page of the news, the newest first, continuing after the cursor. The page is loaded with a range scan
+    of the created_at, id index without the text column, and cached until the next News change
+
+    :param cursor: The "next" cursor of the previous page or None for the first page
+    :param limit: The number of news on the page
+    :type limit: int
+    :param mode: One of LIST_MODES
+    :type mode: str
+    :return: {"results": [...], "next": cursor of the next page or None}
+    :raises ValueError: if the cursor is malformed
+    """
+    key = f"news-page:{get_version('news')}:{cursor or ''}:{limit}:{mode}"
+    page = cache.get(key)
+    if page is not None:
+        return page
+
+    news = News.objects.defer("text")
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        news = news.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=id)
+        )
+    news = list(news.order_by("-created_at", "-id")[:limit])
+    if mode == "title":
+        serializer = NewsTitleSerializer(instance=news, many=True)
+    else:
+        excerpts = RichTextRendition.objects.of(
+            News, [item.pk for item in news], "excerpt"
+        )
+        serializer = NewsListSerializer(
+            instance=news, many=True, context={"excerpts": excerpts}
+        )
+    page = {
+        "results": serializer.data,
+        "next": encode_cursor(news[-1].created_at, news[-1].pk)
+        if len(news) == limit
+        else None,
+    }
+    cache.set(key, page, NEWS_TIMEOUT)
+    return page
+
+
+def get_news_item(news_id: int) -> dict | None:
+    """
+    It returns the news with the sanitized HTML of the text, cached until the next News change
+
+    :param news_id: The id of the news
+    :type news_id: int
+    :return: The serialized news or None if it does not exist.
+    """
+    key = f"news-item:{news_id}:{get_version('news')}"
+    item = cache.get(key)
+    if item is None:
+        news = News.objects.defer("text").filter(pk=news_id).first()
+        # A missing news is cached as well
+        item = {}
+        if news is not None:
+            html = RichTextRendition.objects.of(News, [news.pk], "html")
+            item = NewsSerializer(instance=news, context={"html": html}).data
+        cache.set(key, item, NEWS_TIMEOUT)
+    return item or None
@@ -0,0 +1,212 @@
+import re
+from collections import namedtuple
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+
+# The rich text fields of every model which get renditions, by the model label
+BIO_FIELDS = (
+    "education",
+    "work_experience",
+    "political_experience",
+    "marital_status",
+    "political_opinion",
+    "yerevan_rebuild",
+)
+RICH_TEXT_FIELDS = {
+    "accounts.candidateprofile": BIO_FIELDS,
+    "accounts.candidatepost": ("text",),
+    "primaries_app.news": ("text",),
+}
+
+# Maximum number of characters of an excerpt, without the ellipsis
+EXCERPT_LENGTH = 200
+
+ALLOWED_TAGS = {
+    "a",
+    "b",
+    "blockquote",
+    "br",
+    "code",
+    "div",
+    "em",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "hr",
+    "i",
+    "img",
+    "li",
+    "ol",
+    "p",
+    "pre",
+    "s",
+    "span",
+    "strong",
+    "sub",
+    "sup",
+    "table",
+    "tbody",
+    "td",
+    "th",
+    "thead",
+    "tr",
+    "u",
+    "ul",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": {"href", "title", "target"},
+    "img": {"src", "alt", "width", "height"},
+    "td": {"colspan", "rowspan"},
+    "th": {"colspan", "rowspan"},
+}
+URL_ATTRIBUTES = {"href", "src"}
+ALLOWED_SCHEMES = {"", "http", "https", "mailto"}
+# Tags dropped together with their content
+DROPPED_TAGS = {"script", "style", "iframe", "object", "embed", "template"}
+VOID_TAGS = {"br", "hr", "img"}
+# Open tags closed by the start of the tag without an end tag, as browsers do
+IMPLIED_ENDS = {
+    "li": {"li"},
+    "p": {"p"},
+    "tr": {"tr", "td", "th"},
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+}
+# Tags which start a new line of the plain text
+BLOCK_TAGS = {
+    "blockquote",
+    "br",
+    "div",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "hr",
+    "li",
+    "p",
+    "pre",
+    "tr",
+}
+
+Rendition = namedtuple("Rendition", ("html", "text", "excerpt"))
+
+_SPACES = re.compile(r"\s+")
+
+
+class _Renderer(HTMLParser):
+    """It rebuilds the allowed part of the HTML and collects its plain text at the same time"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html = []
+        self.text = []
+        self.open = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append("\n")
+        if tag not in ALLOWED_TAGS:
+            return
+        while self.open and self.open[-1] in IMPLIED_ENDS.get(tag, ()):
+            self.html.append(f"</{self.open.pop()}>")
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        attributes = "".join(
+            f' {name}="{escape(value, quote=True)}"'
+            for name, value in attrs
+            if name in allowed
+            and value is not None
+            and (name not in URL_ATTRIBUTES or _is_safe_url(value))
+        )
+        self.html.append(f"<{tag}{attributes}>")
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in DROPPED_TAGS:
+            self.dropping -= 1
+        elif not self.dropping and tag in ALLOWED_TAGS and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append("\n")
+        if tag in self.open:
+            # Closing the tags left open inside it as well
+            while self.open:
+                open_tag = self.open.pop()
+                self.html.append(f"</{open_tag}>")
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.html.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open:
+            self.html.append(f"</{self.open.pop()}>")
+
+
+def _is_safe_url(url: str) -> bool:
+    # Browsers ignore control characters and spaces inside the scheme, "java\tscript:" is still javascript
+    cleaned = "".join(char for char in url if char > " ")
+    try:
+        return urlsplit(cleaned).scheme.lower() in ALLOWED_SCHEMES
+    except ValueError:
+        return False
+
+
+def excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    """
+    It shortens the plain text to the length, cutting it at the last whole word
+
+    :param text: The plain text
+    :param length: The maximum number of characters
+    :return: The excerpt, ending with an ellipsis if the text was cut.
+    """
+    text = _SPACES.sub(" ", text).strip()
+    if len(text) <= length:
+        return text
+    cut = text[: length + 1]
+    cut = cut.rsplit(" ", 1)[0] if " " in cut else cut[:length]
+    return cut.rstrip(" ,.;:՝։-") + "…"
+
+
+def render(value: str | None) -> Rendition:
+    """
+    It renders a CKEditor HTML value into the sanitized HTML with only the allowed tags, attributes and URLs, the plain
+    text with a line for every block, and the excerpt of the plain text
+
+    :param value: The stored HTML
+    :return: The Rendition.
+    """
+    renderer = _Renderer()
+    renderer.feed(value or "")
+    renderer.close()
+    lines = (
+        _SPACES.sub(" ", line).strip() for line in "".join(renderer.text).split("\n")
+    )
+    text = "\n".join(line for line in lines if line)
+    return Rendition("".join(renderer.html), text, excerpt(text))
@@ -0,0 +1,62 @@
+import threading
+from collections import namedtuple
+
+from accounts.models import CandidateProfile
+from accounts.utils import bump_version, get_version
+
+
+RosterEntry = namedtuple("RosterEntry", ("gender", "is_candidate", "region", "party"))
+
+_roster = {"version": None, "candidates": {}}
+_lock = threading.Lock()
+
+
+def get_roster() -> dict:
+    """
+    It returns the roster of all candidate profiles, reloading it only if some profile or user was changed since the
+    last load
+
+    :return: dict where key is the candidate profile id and value is a RosterEntry
+    """
+    version = get_version("roster")
+    if _roster["version"] != version:
+        with _lock:
+            if _roster["version"] != version:
+                candidates = {
+                    id: RosterEntry(gender, bool(is_candidate), region, party)
+                    for id, gender, is_candidate, region, party in CandidateProfile.objects.values_list(
+                        "id", "gender", "user__is_candidate", "region", "party"
+                    )
+                }
+                _roster.update(version=version, candidates=candidates)
+    return _roster["candidates"]
+
+
+def get_candidate(candidate_id) -> RosterEntry | None:
+    """
+    It returns the roster entry of the candidate profile
+
+    :param candidate_id: The id of the candidate profile, may be a string from the query params
+    :return: The RosterEntry or None if the profile does not exist.
+    """
+    try:
+        return get_roster().get(int(candidate_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_eligible(candidate_id) -> bool:
+    """
+    It checks if the candidate profile exists and its user is a confirmed candidate, so it can be evaluated and voted
+    for
+
+    :param candidate_id: The id of the candidate profile
+    :return: True or False
+    """
+    candidate = get_candidate(candidate_id)
+    return candidate is not None and candidate.is_candidate
+
+
+def invalidate_roster() -> None:
+    """It marks the roster of every process as stale"""
+    bump_version("roster")
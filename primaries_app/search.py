@@ -0,0 +1,74 @@
+import html
+import re
+import unicodedata
+
+from django.apps import apps
+from django.utils.html import strip_tags
+
+from accounts.utils import bump_version
+
+from .richtext import BIO_FIELDS
+from .roster import is_eligible
+
+
+# Maximum number of candidates a search returns
+SEARCH_LIMIT = 50
+
+# Armenian emphasis, exclamation, question and abbreviation marks are written inside the words
+_INNER_MARKS = re.compile("[՚-՟]")
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str | None) -> str:
+    """
+    It turns rich text or a search query into the lowercase words the search index stores. The ligature "և", the
+    classical "եւ" and the uppercase "ԵՎ" all become "եվ", so every spelling of "Երևան" matches the others
+
+    :param text: The text, may contain HTML
+    :return: The words separated by spaces.
+    """
+    text = html.unescape(strip_tags(text or ""))
+    # NFKC splits the ligature "և" into "եւ"
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _INNER_MARKS.sub("", text).replace("եւ", "եվ")
+    return " ".join(_WORD.findall(text))
+
+
+def build_document(profile, posts) -> str:
+    """
+    It builds the searched text of the candidate from the names, the party, the plain text of the bio fields and the
+    titles and texts of the posts
+
+    :param profile: The CandidateProfile
+    :param posts: The CandidatePosts of the profile
+    :return: The normalized text.
+    """
+    parts = [profile.first_name, profile.last_name, profile.party]
+    parts += [getattr(profile, field) for field in BIO_FIELDS]
+    for post in posts:
+        parts += [post.title, post.text]
+    return " ".join(filter(None, map(normalize, parts)))
+
+
+def search_candidates(query: str, limit: int = SEARCH_LIMIT) -> list:
+    """
+    It finds the confirmed candidates having a word starting with every word of the query, so the results follow the
+    typing
+
+    :param query: The search query
+    :type query: str
+    :param limit: The maximum number of candidates
+    :type limit: int
+    :return: list of candidate profile ids, the best matches first.
+    """
+    words = normalize(query).split()
+    if not words:
+        return []
+    # Unconfirmed candidates are dropped after the match, there are few of them
+    matches = apps.get_model("primaries_app", "CandidateDocument").objects.match(words)
+    return [id for id in matches if is_eligible(id)][:limit]
+
+
+def invalidate_search() -> None:
+    """It marks the cached search responses of every process as stale"""
+    bump_version("search")
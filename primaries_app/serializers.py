@@ -1,15 +1,21 @@
 from rest_framework import serializers
 
-from accounts.models import User, VoterProfile
+from accounts.models import VoterProfile
 
 from .models import CandidateProfile, EvaluateModel, MarkModel, News, PayViaImage
+from .richtext import BIO_FIELDS
+from .roster import is_eligible
 
 
 __all__ = [
     "MarkModelSerializer",
     "EvaluateModelSerializer",
+    "EvaluateBatchSerializer",
     "NewsSerializer",
+    "NewsListSerializer",
+    "NewsTitleSerializer",
     "CandidateProfilesSerializer",
+    "CandidateCardSerializer",
     "PayViaImageSerializer",
 ]
 
@@ -28,7 +34,7 @@ class EvaluateModelSerializer(serializers.ModelSerializer):
         :param attrs: request data
         :return: request data if success otherwise rise exception
         """
-        if not User.objects.get(candidateprofile=attrs["candidate"]).is_candidate:
+        if not is_eligible(attrs["candidate"].pk):
             raise serializers.ValidationError(
                 "candidate profile not exist or not confirmed"
             )
@@ -40,16 +46,102 @@ class EvaluateModelSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class EvaluationSerializer(serializers.Serializer):
+    candidate = serializers.IntegerField()
+    poll = serializers.IntegerField()
+
+
+class EvaluateBatchSerializer(serializers.Serializer):
+    evaluations = EvaluationSerializer(many=True, allow_empty=False)
+
+    def validate_evaluations(self, evaluations):
+        """
+            check the candidates against the candidate roster and the polls with one query
+
+        :param evaluations: list of {"candidate": id, "poll": id} dicts
+        :return: list of (candidate id, poll id, mark) tuples if success otherwise rise exception
+        """
+        marks = MarkModel.objects.in_bulk(
+            {evaluation["poll"] for evaluation in evaluations}
+        )
+        result = []
+        seen = set()
+        for evaluation in evaluations:
+            if not is_eligible(evaluation["candidate"]):
+                raise serializers.ValidationError(
+                    "candidate profile not exist or not confirmed"
+                )
+            if evaluation["candidate"] in seen:
+                raise serializers.ValidationError(
+                    "Թեկնածուն գնահատված է մեկից ավելի անգամ"
+                )
+            seen.add(evaluation["candidate"])
+            if evaluation["poll"] not in marks:
+                raise serializers.ValidationError("Գնահատականը գոյություն չունի")
+            result.append(
+                (
+                    evaluation["candidate"],
+                    evaluation["poll"],
+                    marks[evaluation["poll"]].mark,
+                )
+            )
+        return result
+
+
 class NewsSerializer(serializers.ModelSerializer):
+    text = serializers.SerializerMethodField()
+
+    def get_text(self, obj):
+        """the sanitized html of the text from the "html" renditions in the context"""
+        return self.context["html"][obj.pk].get("text", "")
+
     class Meta:
         model = News
         fields = "__all__"
 
 
+class NewsListSerializer(serializers.ModelSerializer):
+    excerpt = serializers.SerializerMethodField()
+
+    def get_excerpt(self, obj):
+        """the excerpt of the text from the "excerpts" renditions in the context"""
+        return self.context["excerpts"][obj.pk].get("text", "")
+
+    class Meta:
+        model = News
+        exclude = ("text",)
+
+
+class NewsTitleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = News
+        exclude = ("text",)
+
+
 class CandidateProfilesSerializer(serializers.ModelSerializer):
+    excerpts = serializers.SerializerMethodField()
+
+    def get_excerpts(self, obj):
+        """the excerpts of the bio fields from the "excerpts" renditions in the context"""
+        return self.context["excerpts"][obj.pk]
+
+    class Meta:
+        model = CandidateProfile
+        exclude = ("is_email_verified",) + BIO_FIELDS
+
+
+class CandidateCardSerializer(serializers.ModelSerializer):
     class Meta:
         model = CandidateProfile
-        exclude = ("is_email_verified",)
+        fields = (
+            "id",
+            "first_name",
+            "last_name",
+            "picture",
+            "party",
+            "region",
+            "gender",
+        )
 
 
 class PayViaImageSerializer(serializers.ModelSerializer):
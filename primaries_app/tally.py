@@ -0,0 +1,266 @@
+from collections import defaultdict, namedtuple
+
+from django.core.cache import cache
+
+import numpy as np
+
+from .managers import existing_candidates
+from .models import Ballot, ResultSnapshot, StageTally
+
+
+# Ballots of one stage packed into arrays:
+# candidates - ids of the candidates, a candidate index in ballots points into this array
+# ballots - voters x positions matrix of candidate indexes, positions after the end of a ballot are -1
+# weights - the votes count of every voter
+StageBallots = namedtuple("StageBallots", ("candidates", "ballots", "weights"))
+
+# Maximum number of voter x candidate x candidate cells compared at once by the Schulze method
+PAIRWISE_CHUNK = 4_000_000
+
+
+def load_ballots(stage: int) -> StageBallots:
+    """
+    It loads all ballots of the stage into a StageBallots, unpacking the candidate ids straight into arrays. The
+    positions of deleted candidates are left empty, the other candidates keep their positions
+
+    :param stage: The stage of the election
+    :type stage: int
+    :return: StageBallots of the stage.
+    """
+    rows = list(
+        Ballot.objects.filter(stage=stage)
+        .order_by("voter_id")
+        .values_list("candidates", "votes_count")
+    )
+    packed = [np.frombuffer(bytes(candidates), dtype="<i4") for candidates, _ in rows]
+    lengths = np.array([len(ids) for ids in packed], dtype=np.int64)
+    flat = np.concatenate(packed) if packed else np.empty(0, dtype=np.int32)
+    candidates, candidate_index = np.unique(flat.astype(np.int64), return_inverse=True)
+    existing = np.isin(candidates, list(existing_candidates(candidates.tolist())))
+    # The new indexes of the existing candidates, -1 for the deleted ones
+    remap = np.where(existing, np.cumsum(existing) - 1, -1)
+    candidates = candidates[existing]
+
+    ballots = np.full((len(rows), lengths.max(initial=0)), -1, dtype=np.int32)
+    voter_index = np.repeat(np.arange(len(rows)), lengths)
+    positions = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    ballots[voter_index, positions] = remap[candidate_index]
+    weights = np.array([votes_count for _, votes_count in rows], dtype=np.float64)
+    return StageBallots(candidates, ballots, weights)
+
+
+def _positional(stage_ballots: StageBallots, position_points: np.ndarray) -> np.ndarray:
+    """
+    It sums weight * position_points[position] for every ranked candidate
+
+    :param stage_ballots: The ballots of the stage
+    :param position_points: points of every position, starting from the first one
+    :return: array of the scores of the candidates.
+    """
+    ranked = stage_ballots.ballots >= 0
+    points = stage_ballots.weights[:, None] * position_points[None, :]
+    return np.bincount(
+        stage_ballots.ballots[ranked],
+        weights=points[ranked],
+        minlength=len(stage_ballots.candidates),
+    )
+
+
+def dowdall(stage_ballots: StageBallots) -> np.ndarray:
+    """The current rule: the candidate at position i gets votes_count / i points"""
+    positions = np.arange(1, stage_ballots.ballots.shape[1] + 1)
+    return _positional(stage_ballots, 1 / positions)
+
+
+def borda(stage_ballots: StageBallots) -> np.ndarray:
+    """The candidate at position i gets (number of candidates - i) points, unranked candidates get nothing"""
+    positions = np.arange(1, stage_ballots.ballots.shape[1] + 1)
+    return _positional(
+        stage_ballots, np.maximum(len(stage_ballots.candidates) - positions, 0)
+    )
+
+
+def approval(stage_ballots: StageBallots) -> np.ndarray:
+    """Every ranked candidate gets the same one point regardless of the position"""
+    return _positional(stage_ballots, np.ones(stage_ballots.ballots.shape[1]))
+
+
+def pairwise_preferences(stage_ballots: StageBallots) -> np.ndarray:
+    """
+    It counts for every pair of candidates the weighted number of voters preferring the first one to the second one.
+    A ranked candidate is preferred to every unranked candidate
+
+    :param stage_ballots: The ballots of the stage
+    :return: candidates x candidates matrix of the preferences.
+    """
+    voters, length = stage_ballots.ballots.shape
+    count = len(stage_ballots.candidates)
+    ranks = np.full((voters, count), length + 1, dtype=np.int32)
+    ranked = stage_ballots.ballots >= 0
+    voter_index, position = np.nonzero(ranked)
+    ranks[voter_index, stage_ballots.ballots[ranked]] = position + 1
+
+    preferences = np.zeros((count, count), dtype=np.float64)
+    chunk = max(1, PAIRWISE_CHUNK // max(count * count, 1))
+    for start in range(0, voters, chunk):
+        part = ranks[start : start + chunk]
+        preferences += np.einsum(
+            "v,vij->ij",
+            stage_ballots.weights[start : start + chunk],
+            part[:, :, None] < part[:, None, :],
+        )
+    return preferences
+
+
+def schulze(stage_ballots: StageBallots) -> np.ndarray:
+    """
+    The Schulze (Condorcet) method, the score of a candidate is the number of candidates it beats by the strongest
+    paths, so a Condorcet winner gets the maximum score
+
+    :param stage_ballots: The ballots of the stage
+    :return: array of the scores of the candidates.
+    """
+    preferences = pairwise_preferences(stage_ballots)
+    paths = np.where(preferences > preferences.T, preferences, 0)
+    for k in range(len(stage_ballots.candidates)):
+        paths = np.maximum(paths, np.minimum(paths[:, k, None], paths[None, k, :]))
+    return (paths > paths.T).sum(axis=1).astype(np.float64)
+
+
+RULES = {
+    "dowdall": dowdall,
+    "borda": borda,
+    "approval": approval,
+    "schulze": schulze,
+}
+
+
+def score_stage(stage: int, rule: str = "dowdall") -> list:
+    """
+    It computes the result of the stage under the given rule, and caches it until the stage snapshot changes
+
+    :param stage: The stage of the election
+    :type stage: int
+    :param rule: One of the RULES names
+    :type rule: str
+    :return: list of (candidate id, score) ordered by candidate id.
+    """
+    snapshot = ResultSnapshot.objects.latest_for(stage)
+    key = f"vote-rule:{stage}:{rule}:{snapshot.etag if snapshot else 'live'}"
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    stage_ballots = load_ballots(stage)
+    scores = RULES[rule](stage_ballots)
+    result = [
+        (int(candidate), float(score))
+        for candidate, score in zip(stage_ballots.candidates, scores)
+    ]
+    cache.set(key, result, timeout=None if snapshot else 60)
+    return result
+
+
+def candidate_points(stage: int, candidate_id: int) -> list:
+    """
+    It returns the points the candidate got from every ballot of the stage. Candidates without a StageTally row have
+    no votes and are answered without loading the ballots, the lists of the others are computed for every candidate
+    at once and cached until the stage snapshot changes
+
+    :param stage: The stage of the election
+    :type stage: int
+    :param candidate_id: The id of the candidate
+    :type candidate_id: int
+    :return: list of the points, one for every ballot ranking the candidate.
+    """
+    if not StageTally.objects.filter(stage=stage, candidate_id=candidate_id).exists():
+        return []
+    snapshot = ResultSnapshot.objects.latest_for(stage)
+    prefix = f"vote-points:{stage}:{snapshot.etag if snapshot else 'live'}"
+    points = cache.get(f"{prefix}:{candidate_id}")
+    if points is not None:
+        return points
+
+    stage_ballots = load_ballots(stage)
+    ranked = stage_ballots.ballots >= 0
+    voter_index, position = np.nonzero(ranked)
+    cells = stage_ballots.ballots[ranked]
+    values = stage_ballots.weights[voter_index] / (position + 1)
+    # Grouping the points by candidate, a stable sort keeps the voter order inside every group
+    order = np.argsort(cells, kind="stable")
+    counts = np.bincount(cells, minlength=len(stage_ballots.candidates))
+    lists = {
+        f"{prefix}:{candidate}": group.tolist()
+        for candidate, group in zip(
+            stage_ballots.candidates.tolist(),
+            np.split(values[order], np.cumsum(counts)[:-1]),
+        )
+    }
+    cache.set_many(lists, timeout=None if snapshot else 60)
+    return lists.get(f"{prefix}:{candidate_id}", [])
+
+
+def _median(positions: dict, ballots: int) -> float:
+    """
+    It finds the median position from the ballot counts of the positions
+
+    :param positions: dict where key is the position and value is the number of ballots
+    :param ballots: The total number of ballots
+    :return: The median position.
+    """
+    seen = 0
+    lower = None
+    for position in sorted(positions):
+        seen += positions[position]
+        if lower is None and seen > (ballots - 1) // 2:
+            lower = position
+        if seen > ballots // 2:
+            return (lower + position) / 2
+
+
+def stage_breakdown(stage: int) -> list:
+    """
+    It returns for every candidate of the stage the number of ballots at each position, the mean and the median
+    position and the total points. It is computed from the stage snapshot or from the packed ballots, and cached
+
+    :param stage: The voting stage
+    :type stage: int
+    :return: list of dicts ordered by candidate id.
+    """
+    snapshot = ResultSnapshot.objects.latest_for(stage)
+    key = f"vote-breakdown:{stage}:{snapshot.etag if snapshot else 'live'}"
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    positions = defaultdict(dict)
+    if snapshot is not None:
+        points = {candidate: total for candidate, total in snapshot.totals}
+        for candidate, counts in snapshot.positions.items():
+            for position, ballots in counts.items():
+                positions[int(candidate)][int(position)] = ballots
+    else:
+        stage_ballots = load_ballots(stage)
+        candidates = stage_ballots.candidates
+        points = dict(zip(candidates.tolist(), dowdall(stage_ballots).tolist()))
+        for position, column in enumerate(stage_ballots.ballots.T, start=1):
+            counts = np.bincount(column[column >= 0], minlength=len(candidates))
+            for index in np.flatnonzero(counts):
+                positions[int(candidates[index])][position] = int(counts[index])
+
+    result = []
+    for candidate in sorted(positions):
+        counts = positions[candidate]
+        ballots = sum(counts.values())
+        result.append(
+            {
+                "candidate": candidate,
+                "positions": counts,
+                "ballots": ballots,
+                "mean_position": sum(p * n for p, n in counts.items()) / ballots,
+                "median_position": _median(counts, ballots),
+                "points": points[candidate],
+            }
+        )
+    cache.set(key, result, timeout=None if snapshot else 60)
+    return result
@@ -0,0 +1,108 @@
+from django.test import SimpleTestCase
+
+import numpy as np
+
+from .managers import pack_candidates, unpack_candidates
+from .models import Ballot
+from .richtext import render
+from .tally import StageBallots, approval, borda, dowdall, pairwise_preferences, schulze
+
+
+class PackCandidatesTest(SimpleTestCase):
+    def test_round_trip(self):
+        for candidate_ids in ([], [7], [3, 1, 2], list(range(1, 13)), [2**31 - 1]):
+            with self.subTest(candidate_ids=candidate_ids):
+                packed = pack_candidates(candidate_ids)
+                self.assertEqual(len(packed), 4 * len(candidate_ids))
+                self.assertEqual(unpack_candidates(packed), tuple(candidate_ids))
+
+    def test_unpack_memoryview(self):
+        # Postgres returns the binary field as a memoryview
+        packed = pack_candidates([5, 9, 4])
+        self.assertEqual(unpack_candidates(memoryview(packed)), (5, 9, 4))
+
+    def test_ballot_votes(self):
+        ballot = Ballot.objects.build_ballot(1, [5, 9, 4], 3, 2)
+        self.assertEqual(ballot.candidate_ids, (5, 9, 4))
+        self.assertEqual(
+            [
+                (vote.candidate_id, vote.position, vote.points)
+                for vote in ballot.votes()
+            ],
+            [(5, 1, 2.0), (9, 2, 1.0), (4, 3, 2 / 3)],
+        )
+
+
+class RenderTest(SimpleTestCase):
+    def test_javascript_href(self):
+        for value in (
+            '<a href="javascript:alert(1)">x</a>',
+            '<a href="java\tscript:alert(1)">x</a>',
+            '<a href=" JavaScript:alert(1)">x</a>',
+        ):
+            with self.subTest(value=value):
+                self.assertEqual(render(value).html, "<a>x</a>")
+        self.assertEqual(
+            render('<a href="https://x.am" title="t">x</a>').html,
+            '<a href="https://x.am" title="t">x</a>',
+        )
+
+    def test_event_attributes(self):
+        self.assertEqual(render('<p onclick="x()" class="c">t</p>').html, "<p>t</p>")
+        self.assertEqual(
+            render('<img src="a.png" onerror="x()">').html, '<img src="a.png">'
+        )
+
+    def test_disallowed_tags(self):
+        # The dropped tags lose their content, the other disallowed tags keep only their text
+        self.assertEqual(render("<script>alert(1)</script><p>ok</p>").html, "<p>ok</p>")
+        self.assertEqual(
+            render('<iframe src="https://x.am">x</iframe><b>b</b>').html, "<b>b</b>"
+        )
+        self.assertEqual(render('<form><input name="a">t</form>').html, "t")
+
+
+class ScoringRulesTest(SimpleTestCase):
+    # Candidates 10, 20, 30, 40: a voter with 2 votes ranks 10, 20, 30, one ranks 20, 30 and one only 30
+    stage_ballots = StageBallots(
+        np.array([10, 20, 30, 40]),
+        np.array([[0, 1, 2], [1, 2, -1], [2, -1, -1]], dtype=np.int32),
+        np.array([2.0, 1.0, 1.0]),
+    )
+
+    def test_dowdall(self):
+        np.testing.assert_allclose(
+            dowdall(self.stage_ballots), [2, 2 * 1 / 2 + 1, 2 / 3 + 1 / 2 + 1, 0]
+        )
+
+    def test_borda(self):
+        np.testing.assert_allclose(
+            borda(self.stage_ballots), [2 * 3, 2 * 2 + 3, 2 * 1 + 2 + 3, 0]
+        )
+
+    def test_approval(self):
+        np.testing.assert_allclose(approval(self.stage_ballots), [2, 3, 4, 0])
+
+    def test_schulze(self):
+        # 10 and 30 are tied 2:2, but 10 beats 30 through 20 (10 > 20 by 2:1, 20 > 30 by 3:1)
+        np.testing.assert_allclose(schulze(self.stage_ballots), [3, 2, 1, 0])
+
+    def test_schulze_tie(self):
+        stage_ballots = StageBallots(
+            np.array([1, 2, 3]),
+            np.array([[0, 1], [1, 0]], dtype=np.int32),
+            np.array([1.0, 1.0]),
+        )
+        np.testing.assert_allclose(schulze(stage_ballots), [1, 1, 0])
+
+    def test_schulze_cycle(self):
+        # 1 > 2 by 7:2, 2 > 3 by 5:4 and 3 > 1 by 6:3, the strongest paths are 3 > 1 by 6:5 and 3 > 2 by 6:5
+        stage_ballots = StageBallots(
+            np.array([1, 2, 3]),
+            np.array([[0, 1, 2], [1, 2, 0], [2, 0, 1]], dtype=np.int32),
+            np.array([3.0, 2.0, 4.0]),
+        )
+        np.testing.assert_allclose(
+            pairwise_preferences(stage_ballots), [[0, 7, 3], [2, 0, 5], [6, 4, 0]]
+        )
+        np.testing.assert_allclose(schulze(stage_ballots), [1, 0, 2])
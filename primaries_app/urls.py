@@ -6,15 +6,33 @@ from .views import *
 urlpatterns = [
     path("choice_list/", MarkCandidateAPIView.as_view(), name="choice_list"),
     path("evaluate/", EvaluateAPIView.as_view(), name="evaluate"),
+    path("evaluate_batch/", EvaluateBatchAPIView.as_view(), name="evaluate_batch"),
+    path("evaluate_state/", EvaluateStateAPIView.as_view(), name="evaluate_state"),
     path("news/", NewsAPIView.as_view(), name="news"),
     path(
         "candidate-profiles/", GetCandidateProfiles.as_view(), name="candidate_profiles"
     ),
+    path(
+        "candidate-directory/", CandidateDirectory.as_view(), name="candidate_directory"
+    ),
+    path("candidate-facets/", CandidateFacets.as_view(), name="candidate_facets"),
+    path("candidate-search/", CandidateSearch.as_view(), name="candidate_search"),
     path("candidate-profile/", GetCandidateByID.as_view(), name="get_candidate"),
     path("send_email/", SendMailAPIVIEW.as_view(), name="send_api_mail"),
     path("evaluate_result/", GetEvaluateResult.as_view(), name="evaluate_result"),
+    path(
+        "evaluate_distribution/",
+        EvaluateDistribution.as_view(),
+        name="evaluate_distribution",
+    ),
     path("vote/", VoteView.as_view(), name="vote"),
+    path("vote-status/", VoteStatus.as_view(), name="vote_status"),
     path("vote-result/", VoteResult.as_view(), name="vote_result"),
+    path(
+        "vote-result/breakdown/",
+        VoteResultBreakdown.as_view(),
+        name="vote_result_breakdown",
+    ),
     path("pay_via_image/", PayViaImageApiView.as_view(), name="pay_via_image"),
     path('party/', Party.as_view(), name="party")
 ]
@@ -1,7 +1,9 @@
+from collections import Counter
+
 import requests
 from django.conf import settings
 from django.db import IntegrityError
-from django.db.models import Sum
+from django.utils.cache import parse_etags, quote_etag
 from rest_framework import permissions, status
 from rest_framework.exceptions import ParseError
 from rest_framework.permissions import IsAuthenticated
@@ -9,64 +11,88 @@ from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
 from rest_framework.views import APIView
 
-from accounts.models import CandidatePost, CandidateProfile, VoterProfile
-from accounts.serializers import CandidatePostSerializer, CandidateProfileSerializer
-from accounts.utils import VoterPermission, send_mailgun_mail
+from accounts.models import CandidateProfile, VoterProfile
+from accounts.utils import VoterPermission, conditional_get, send_mailgun_mail
+from . import journal
+from .candidates import get_candidate_detail, get_facets, parse_filters
+from .evaluations import get_evaluation_state, get_score_distribution
 from .models import (
+    Ballot,
+    CandidateScore,
     EvaluateModel,
     GlobalConfigs,
     MarkModel,
-    News,
-    VotingModel,
+    ResultSnapshot,
+    RichTextRendition,
+    StageTally,
     choice_stage,
 )
+from .news import LIST_MODES, MAX_PAGE_SIZE, PAGE_SIZE, get_news_item, get_news_page
+from .richtext import BIO_FIELDS
+from .roster import get_candidate, get_roster
+from .search import SEARCH_LIMIT, search_candidates
 from .serializers import *
+from .tally import RULES, candidate_points, score_stage, stage_breakdown
 
 
 __all__ = [
     "MarkCandidateAPIView",
     "EvaluateAPIView",
+    "EvaluateBatchAPIView",
+    "EvaluateStateAPIView",
     "NewsAPIView",
     "GetCandidateProfiles",
+    "CandidateDirectory",
+    "CandidateFacets",
+    "CandidateSearch",
     "GetCandidateByID",
     "SendMailAPIVIEW",
     "GetEvaluateResult",
+    "EvaluateDistribution",
     "VoteView",
+    "VoteStatus",
     "GETStage",
     "VoteResult",
+    "VoteResultBreakdown",
     "PayViaImageApiView",
     "Party"
 ]
 
 
-def has_dublicates(votes: list) -> bool:
-    """
-    It returns True if there are any duplicates in the list, and False otherwise
-
-    :param votes: list
-    :type votes: list
-    :return: True or False
-    """
-
-    for i in votes:
-        if votes.count(i) > 1:
-            return True
-    return False
+def current_stage(request) -> str | None:
+    """It returns the stage for the ETags of the responses which depend on it"""
+    return GlobalConfigs.load().stage
 
 
-def valid_ids(votes: list) -> bool:
+def check_ballot(votes: list, gender_quota: bool) -> str | None:
     """
-    It checks if the list of candidate ids in the votes are valid
+    It validates the ballot against the candidate roster in one pass: every id must be unique and belong to an approved
+    candidate, and if gender_quota is set each gender must have at least 27% of the ballot
 
     :param votes: list of candidate ids
     :type votes: list
-    :return: A list of candidate ids
+    :param gender_quota: check the gender quota or not
+    :type gender_quota: bool
+    :return: The error message or None if the ballot is valid.
     """
-    candidate_ids = [str(i.id) for i in CandidateProfile.objects.all()]
-    for id in votes:
-        if id not in candidate_ids:
-            return False
-    return True
+    roster = get_roster()
+    seen = set()
+    genders = Counter()
+    for candidate_id in votes:
+        if candidate_id in seen:
+            return "Սխալ քվեաթերթիկ"
+        seen.add(candidate_id)
+        candidate = roster.get(candidate_id)
+        if candidate is None or not candidate.is_candidate:
+            return "Թեկնածուների ID-ների Սխալ"
+        genders[candidate.gender] += 1
+
+    if gender_quota:
+        if genders["male"] / len(votes) * 100 < 27:
+            return "Արական թեկնածուների քանակը պետք է գեռազանցի 27% ը"
+        if genders["female"] / len(votes) * 100 < 27:
+            return "Իգական թեկնածուների քանակը պետք է գեռազանցի 27% ը"
+    return None
 
 
 class MarkCandidateAPIView(APIView):
@@ -74,6 +100,7 @@ class MarkCandidateAPIView(APIView):
 
     permission_classes = [permissions.IsAuthenticated, VoterPermission]
 
+    @conditional_get("marks")
     def get(self, request) -> Response:
         """
         It takes a request, gets all the MarkModel objects, serializes them, and returns them in a response
@@ -160,74 +187,215 @@ class EvaluateAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class EvaluateBatchAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated, VoterPermission]
+
+    def post(self, request) -> Response:
+        """
+        It takes a list of {"candidate": id, "poll": id} evaluations and creates or updates all of them in one
+        transaction
+
+        :param request: The request object
+        :return: The number of the created and the updated evaluations.
+        """
+        try:
+            voter_id = VoterProfile.objects.only("pk").get(user_id=request.user.id).pk
+        except VoterProfile.DoesNotExist:
+            raise ValidationError(
+                "Ընտրողի Սխալ. էջը գոյություն չունի!, Նախ ստեղծեք  Ընտրողի էջ․"
+            )
+        serializer = EvaluateBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        created, updated = EvaluateModel.objects.upsert(
+            voter_id, serializer.validated_data["evaluations"]
+        )
+        return Response(
+            {"created": created, "updated": updated}, status=status.HTTP_200_OK
+        )
+
+
+class EvaluateStateAPIView(APIView):
+    permission_classes = [permissions.IsAuthenticated, VoterPermission]
+
+    def get(self, request) -> Response:
+        """
+        It returns every evaluation of the voter at once, so the evaluation page does not ask for each candidate
+
+        :param request: The request object
+        :return: dict where key is the candidate id and value is the poll and its mark.
+        """
+        try:
+            voter_id = VoterProfile.objects.only("pk").get(user_id=request.user.id).pk
+        except VoterProfile.DoesNotExist:
+            raise ValidationError(
+                "Ընտրողի Սխալ. էջը գոյություն չունի!, Նախ ստեղծեք  Ընտրողի էջ․"
+            )
+        return Response(get_evaluation_state(voter_id), status=status.HTTP_200_OK)
+
+
 class NewsAPIView(APIView):
-    """Class which returns news objects in order by creation date"""
+    """Class which returns news objects in order by creation date, the newest first"""
 
+    @conditional_get("news")
     def get(self, request):
         """
-        It gets the id from the query params, if it exists, and if it does, it tries to get the news by id, and if it
-        doesn't exist, it returns a response saying that the news does not exist, and if it does exist, it returns the
-        serialized data
+        It returns the news by the id query param, or a page of the news continuing after the "cursor" query param.
+        The "mode" query param of a page is "excerpt" for the excerpts of the texts or "title" for no text at all. The
+        news and the pages are cached until the next News change
 
         :param request: The request object is the first parameter to any view. It contains all the information about the
         request that was made to the server
-        :return: A list of all the news objects in the database.
+        :return: The news, or the news of the page and the cursor of the next page.
         """
         id = request.query_params.get("id", None)
         if id is not None:
             try:
-                news_by_id = News.objects.get(id=id)
-            except News.DoesNotExist:
+                news_by_id = get_news_item(int(id))
+            except ValueError:
+                news_by_id = None
+            if news_by_id is None:
                 return Response(
                     "New does not exist", status=status.HTTP_400_BAD_REQUEST
                 )
-            else:
-                serializer = NewsSerializer(instance=news_by_id)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-        news = News.objects.all().order_by("created_at")
-        serializer = NewsSerializer(instance=news, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(news_by_id, status=status.HTTP_200_OK)
+
+        mode = request.query_params.get("mode", LIST_MODES[0])
+        try:
+            limit = min(
+                int(request.query_params.get("limit", PAGE_SIZE)), MAX_PAGE_SIZE
+            )
+            if limit < 1 or mode not in LIST_MODES:
+                raise ValueError(mode)
+            page = get_news_page(request.query_params.get("cursor"), limit, mode)
+        except ValueError:
+            return Response("Սխալ պարամետրեր", status=status.HTTP_400_BAD_REQUEST)
+        return Response(page, status=status.HTTP_200_OK)
 
 
 class GetCandidateProfiles(APIView):
+    @conditional_get("roster")
     def get(self, request) -> Response:
         """
-        It returns a list of all candidate profiles
+        It returns a list of all candidate profiles, with the excerpts of the bio fields instead of their HTML
 
         :param request: The request object
         :return: A list of all the candidate profiles.
         """
-        response = CandidateProfile.objects.filter(user__is_candidate=True)
-        serializer = CandidateProfilesSerializer(instance=response, many=True)
+        response = list(
+            CandidateProfile.objects.filter(user__is_candidate=True).defer(*BIO_FIELDS)
+        )
+        excerpts = RichTextRendition.objects.of(
+            CandidateProfile, [profile.pk for profile in response], "excerpt"
+        )
+        serializer = CandidateProfilesSerializer(
+            instance=response, many=True, context={"excerpts": excerpts}
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class CandidateDirectory(APIView):
+    page_size = 50
+    max_page_size = 200
+
+    @conditional_get("roster")
+    def get(self, request) -> Response:
+        """
+        It returns a page of the candidate cards ordered by id, the next page starts after the "next" id. The cards
+        can be filtered by the party, region and gender query params
+
+        :param request: The request object
+        :return: The cards of the page and the id to continue from.
+        """
+        try:
+            after = int(request.query_params.get("after", 0))
+            limit = min(
+                int(request.query_params.get("limit", self.page_size)),
+                self.max_page_size,
+            )
+            filters = parse_filters(request.query_params)
+        except ValueError:
+            return Response("Սխալ պարամետրեր", status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response("Սխալ պարամետրեր", status=status.HTTP_400_BAD_REQUEST)
+
+        candidates = list(
+            CandidateProfile.objects.filter(
+                user__is_candidate=True, id__gt=after, **filters
+            ).order_by("id")
+            # The rich text fields are loaded only by the detail endpoint
+            .only(*CandidateCardSerializer.Meta.fields)[:limit]
+        )
+        serializer = CandidateCardSerializer(instance=candidates, many=True)
+        return Response(
+            {
+                "results": serializer.data,
+                "next": candidates[-1].id if len(candidates) == limit else None,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class CandidateFacets(APIView):
+    @conditional_get("roster")
+    def get(self, request) -> Response:
+        """
+        It returns the number of the candidates for every party, region and gender, filtered by the same query params
+        as the candidate directory
+
+        :param request: The request object
+        :return: The total and the counts of every facet.
+        """
+        try:
+            filters = parse_filters(request.query_params)
+        except ValueError:
+            return Response("Սխալ պարամետրեր", status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_facets(filters), status=status.HTTP_200_OK)
+
+
+class CandidateSearch(APIView):
+    @conditional_get("roster", "search")
+    def get(self, request) -> Response:
+        """
+        It searches the names, the party, the bio and the posts of the candidates by the "q" query param
+
+        :param request: The request object
+        :return: The cards of the found candidates, the best matches first.
+        """
+        try:
+            limit = min(
+                int(request.query_params.get("limit", SEARCH_LIMIT)), SEARCH_LIMIT
+            )
+        except ValueError:
+            return Response("Սխալ պարամետրեր", status=status.HTTP_400_BAD_REQUEST)
+        ids = search_candidates(request.query_params.get("q", ""), max(limit, 0))
+        candidates = CandidateProfile.objects.only(
+            *CandidateCardSerializer.Meta.fields
+        ).in_bulk(ids)
+        serializer = CandidateCardSerializer(
+            instance=[candidates[id] for id in ids if id in candidates], many=True
+        )
+        return Response({"results": serializer.data}, status=status.HTTP_200_OK)
+
+
 class GetCandidateByID(APIView):
     permission_classes = (IsAuthenticated, VoterPermission)
 
     def get(self, request):
         """
-        It gets a candidate profile and then gets all the posts associated with that profile and returns them in a response
+        It returns the cached candidate profile with all the posts associated with that profile
 
         :param request: The request object
         :return: The candidate profile and the candidate posts
         """
         try:
-            candidate = CandidateProfile.objects.get(
-                id=request.query_params.get("id", None)
-            )
-        except CandidateProfile.DoesNotExist:
+            detail = get_candidate_detail(int(request.query_params.get("id", None)))
+        except (TypeError, ValueError):
+            detail = None
+        if detail is None:
             return Response(
                 "Candidate profile does not exist", status=status.HTTP_400_BAD_REQUEST
             )
-        else:
-            posts = CandidatePost.objects.filter(profile=candidate)
-            post_serializer = CandidatePostSerializer(instance=posts, many=True)
-            serializer = CandidateProfileSerializer(instance=candidate)
-            return Response(
-                {"profile": serializer.data, "posts": post_serializer.data},
-                status=status.HTTP_200_OK,
-            )
+        return Response(detail, status=status.HTTP_200_OK)
 
 
 class SendMailAPIVIEW(APIView):
@@ -269,6 +437,7 @@ class SendMailAPIVIEW(APIView):
 
 
 class GetEvaluateResult(APIView):
+    @conditional_get("evaluations", "marks", "roster", key=current_stage)
     def get(self, request):
         """
         It takes a candidate ID as a query parameter, and if it exists, it returns the sum of the points of all the polls
@@ -281,38 +450,46 @@ class GetEvaluateResult(APIView):
         :return: The sum of the points of the candidate.
         """
         candidate_id = request.query_params.get("candidate", None)
-        if GlobalConfigs.objects.get(id=1).stage != "2":
+        if GlobalConfigs.load().stage != "2":
             return Response(
                 "Այս փուլում գնահատման արդյունքները հասանելի չեն",
                 status=status.HTTP_409_CONFLICT,
             )
         if candidate_id:
-            try:
-                candidate_profile = CandidateProfile.objects.get(id=candidate_id)
-            except CandidateProfile.DoesNotExist:
+            candidate = get_candidate(candidate_id)
+            if candidate is None:
                 return Response(
                     "Նշված ID-ով Թեկնածու գոյություն չունի",
                     status=status.HTTP_400_BAD_REQUEST,
                 )
             else:
-                if not candidate_profile.user.is_candidate:
+                if not candidate.is_candidate:
                     return Response(
                         "Նշված ID-ով Թեկնածուն հասանելի չէ",
                         status=status.HTTP_400_BAD_REQUEST,
                     )
-                queryset = EvaluateModel.objects.filter(candidate=candidate_profile)
-                res = sum([i.poll.mark for i in queryset])
+                res = CandidateScore.objects.points(candidate_id)
                 return Response({"points": res})
 
         else:
-            res = (
-                EvaluateModel.objects.values("candidate")
-                .order_by("candidate")
-                .annotate(points=Sum("poll__mark"))
-            )
+            res = CandidateScore.objects.totals()
             return Response(res, status.HTTP_200_OK)
 
 
+class EvaluateDistribution(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        """
+        It returns for every candidate the number of evaluations with every mark, the mean and the variance of the
+        marks and the place of the candidate among all candidates
+
+        :param request: The request object
+        :return: The levels of the marks and the distributions of the candidates.
+        """
+        return Response(get_score_distribution(), status=status.HTTP_200_OK)
+
+
 class VoteView(APIView):
     permission_classes = (permissions.IsAuthenticated, VoterPermission)
 
@@ -324,9 +501,9 @@ class VoteView(APIView):
         :param request: The request object
         """
         # Getting the votes from the request.data and then getting the stage from the
-        # GlobalConfigs.objects.get(id=1).stage
+        # GlobalConfigs.load().stage
         votes = request.data.get("votes", None)
-        stage = GlobalConfigs.objects.get(id=1).stage
+        stage = GlobalConfigs.load().stage
         try:
             voter_profile = VoterProfile.objects.get(user=request.user)
         except VoterProfile.DoesNotExist:
@@ -336,9 +513,15 @@ class VoteView(APIView):
             return Response(
                 "ընտրության տվյալները դատարկ են", status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            votes = [int(i) for i in votes]
+        except (TypeError, ValueError):
+            return Response(
+                "Թեկնածուների ID-ների Սխալ", status=status.HTTP_400_BAD_REQUEST
+            )
 
         # Checking if the stage is 5 and if the length of the votes is not 7.
-        if GlobalConfigs.objects.get(id=1).stage == "5":
+        if stage == "5":
             if len(votes) != 7:
                 return Response(
                     "Պետք է ընտրել Ճիշտ 7 թեկնածու", status=status.HTTP_400_BAD_REQUEST
@@ -352,82 +535,94 @@ class VoteView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Checking if there are any dublicates in the votes list.
-            if has_dublicates(votes):
-                return Response("Սխալ քվեաթերթիկ", status=status.HTTP_400_BAD_REQUEST)
-            # Checking if the votes are valid.
-            if not valid_ids(votes):
-                return Response(
-                    "Թեկնածուների ID-ների Սխալ", status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # Checking if the voter has already voted in the current stage.
-            if VotingModel.objects.filter(voter=voter_profile, stage=stage).exists():
-                return Response(
-                    "Ընտրողը արդեն քվերկել է", status=status.HTTP_400_BAD_REQUEST
-                )
+        # Checking the ids and the gender quota of the votes against the candidate roster.
+        error = check_ballot(votes, gender_quota=stage != "5")
+        if error is not None:
+            return Response(error, status=status.HTTP_400_BAD_REQUEST)
 
-            # Checking if the number of male and female candidates is less than 27%
-            candidates = CandidateProfile.objects.filter(id__in=votes).values_list(
-                "gender"
+        if stage is None:
+            return Response(
+                "Այս փուլում քվեարկություն չկա", status=status.HTTP_400_BAD_REQUEST
             )
-            if (
-                len([i[0] for i in candidates if i[0] == "male"])
-                / len(candidates)
-                * 100
-                < 27
-            ):
-                return Response(
-                    "Արական թեկնածուների քանակը պետք է գեռազանցի 27% ը",
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            if (
-                len([i[0] for i in candidates if i[0] == "female"])
-                / len(candidates)
-                * 100
-                < 27
+        # A ballot without the votes count of the voter would have no weight
+        if not voter_profile.votes_count:
+            return Response(
+                "Ընտրողի ձայների քանակը նշված չէ", status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if settings.BALLOT_JOURNAL:
+            # Only appending the ballot to the journal, the drain_ballots worker will store it.
+            if not journal.append(
+                voter_profile.pk, stage, votes, voter_profile.votes_count
             ):
                 return Response(
-                    "Իգական թեկնածուների քանակը պետք է գեռազանցի 27% ը",
-                    status=status.HTTP_400_BAD_REQUEST,
+                    "Ընտրողը արդեն քվերկել է", status=status.HTTP_400_BAD_REQUEST
                 )
+            return Response("OK", status.HTTP_202_ACCEPTED)
 
-        # The above code is enumerating the votes list and assigning the index to i and the value to j.
-        for i, j in enumerate(votes, start=1):
-            # Checking if the value of i is greater than the number of CandidateProfile objects in the database.
-            if i > CandidateProfile.objects.all().count():
-                return Response(
-                    "Ընտրության համարի սԽալ", status=status.HTTP_400_BAD_REQUEST
-                )
-            # Creating a voting model object.
-            try:
-                VotingModel.objects.create(
-                    voter=voter_profile,
-                    candidate=CandidateProfile.objects.get(id=j),
-                    position=i,
-                    points=1 / i * voter_profile.votes_count,
-                    stage=stage,
-                )
-            except CandidateProfile.DoesNotExist:
+        # Storing the ballot and marking the voter in one transaction.
+        try:
+            Ballot.objects.cast_ballot(voter_profile, votes, stage)
+        except IntegrityError:
+            # Only the unique (voter, stage) constraint means a second ballot, the other constraint is the running
+            # total of a candidate deleted after the roster check
+            if Ballot.objects.filter(voter=voter_profile, stage=stage).exists():
                 return Response(
-                    f"Նշված ID ով թեկնածու գոյություն չունի id={j}",
-                    status=status.HTTP_400_BAD_REQUEST,
+                    "Ընտրողը արդեն քվերկել է", status=status.HTTP_400_BAD_REQUEST
                 )
-        else:
-            voter_profile.already_voted = True
-            voter_profile.save()
+            return Response(
+                "Թեկնածուների ID-ների Սխալ", status=status.HTTP_400_BAD_REQUEST
+            )
         return Response("OK", status.HTTP_200_OK)
 
 
+class VoteStatus(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get(self, request):
+        """
+        It returns the status of the voter's ballot of the current stage:
+        committed - the ballot is stored,
+        pending - the ballot is in the ballot journal and will be stored soon,
+        rejected - the ballot could not be stored,
+        none - the voter has not voted
+
+        :param request: The request object
+        :return: The status of the ballot.
+        """
+        stage = GlobalConfigs.load().stage
+        try:
+            voter_profile = VoterProfile.objects.get(user=request.user)
+        except VoterProfile.DoesNotExist:
+            return Response(
+                "Ընտրողի տվյալների սխալ", status=status.HTTP_400_BAD_REQUEST
+            )
+        if stage not in ("3", "5"):
+            return Response({"status": "none"}, status=status.HTTP_200_OK)
+
+        if Ballot.objects.filter(voter=voter_profile, stage=stage).exists():
+            return Response({"status": journal.COMMITTED}, status=status.HTTP_200_OK)
+        entry = None
+        if settings.BALLOT_JOURNAL:
+            entry = journal.get_status(voter_profile.pk, stage)
+        if entry is None:
+            return Response({"status": "none"}, status=status.HTTP_200_OK)
+        ballot_status, error = entry
+        return Response(
+            {"status": ballot_status, "error": error}, status=status.HTTP_200_OK
+        )
+
+
 class GETStage(APIView):
+    @conditional_get(key=current_stage)
     def get(self, request):
         """
-        It returns a response with the stage of the GlobalConfigs object with id=1
+        It returns a response with the stage of the GlobalConfigs object
 
         :param request: The request object
         :return: The stage of the game.
         """
-        stage = GlobalConfigs.objects.get(id=1).stage
+        stage = GlobalConfigs.load().stage
         name = None
         for i in choice_stage:
             if i[0] == stage:
@@ -439,24 +634,26 @@ class GETStage(APIView):
 
 def get_vote_result(stage: int, id: str):
     if id is not None:
-        res = {
-            id: VotingModel.objects.filter(candidate_id=id, stage=stage).values_list(
-                "points"
-            )
-        }
+        points = candidate_points(stage, int(id)) if id.isdigit() else []
+        res = {id: [(value,) for value in points]}
     else:
         res = (
-            VotingModel.objects.filter(stage=stage)
-            .values_list("candidate")
+            StageTally.objects.filter(stage=stage)
+            .values_list("candidate", "points")
             .order_by("candidate")
-            .annotate(points=Sum("points"))
         )
     return res
 
 
 class VoteResult(APIView):
+    def get_permissions(self):
+        # Recomputing the result under another rule loads every ballot of the stage, only admins may do it
+        if "rule" in self.request.query_params:
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
     def get(self, request):
-        stage = GlobalConfigs.objects.get(id=1).stage
+        stage = GlobalConfigs.load().stage
         # Ստուգում է արդյունքները անհասնելի են թե ոչ
         if stage not in ("4", None):
             return Response(
@@ -464,13 +661,51 @@ class VoteResult(APIView):
                 status=status.HTTP_409_CONFLICT,
             )
         id = request.query_params.get("id", None)
-        if stage == "4":
-            res = get_vote_result(stage=3, id=id)
-        else:
-            res = get_vote_result(stage=5, id=id)
+        rule = request.query_params.get("rule", None)
+        result_stage = 3 if stage == "4" else 5
+        if rule is not None:
+            # Recomputing the result under another scoring rule, for comparing it with the official one
+            if rule not in RULES:
+                return Response(
+                    f"Անհայտ հաշվարկի կանոն, հասանելի են {', '.join(RULES)}",
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            return Response(score_stage(result_stage, rule), status=status.HTTP_200_OK)
+        if id is None:
+            # Serving the frozen results, if the stage was closed after snapshots were introduced
+            snapshot = ResultSnapshot.objects.latest_for(result_stage)
+            if snapshot is not None:
+                etag = quote_etag(snapshot.etag)
+                if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                    return Response(
+                        status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+                    )
+                return Response(
+                    snapshot.totals, status=status.HTTP_200_OK, headers={"ETag": etag}
+                )
+        res = get_vote_result(stage=result_stage, id=id)
         return Response(res, status=status.HTTP_200_OK)
 
 
+class VoteResultBreakdown(APIView):
+    def get(self, request):
+        """
+        It returns for every candidate the number of ballots at each position, the mean and the median position and
+        the total points of the last voting stage
+
+        :param request: The request object
+        :return: list of the breakdowns of the candidates.
+        """
+        stage = GlobalConfigs.load().stage
+        if stage not in ("4", None):
+            return Response(
+                "Այս փուլում ընտրության արդյունքները անհասնելի են",
+                status=status.HTTP_409_CONFLICT,
+            )
+        result_stage = 3 if stage == "4" else 5
+        return Response(stage_breakdown(result_stage), status=status.HTTP_200_OK)
+
+
 class PayViaImageApiView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
@@ -493,8 +728,14 @@ class PayViaImageApiView(APIView):
 
 class Party(APIView):
 
-    def get(self, requset):
-        values = CandidateProfile.objects.all().values_list('party', flat=True)
-        values = set(values)
-        print(values)
-        return Response({"party": values}, status=status.HTTP_200_OK)
\ No newline at end of file
+    @conditional_get("roster")
+    def get(self, request):
+        """
+        It returns the parties of the candidates, sorted, from the cached facet summary
+
+        :param request: The request object
+        :return: The list of the parties.
+        """
+        return Response(
+            {"party": list(get_facets({})["party"])}, status=status.HTTP_200_OK
+        )
\ No newline at end of file